@@ -1,13 +1,25 @@
 from flask import Blueprint, jsonify
-from . import chat, data, gmail, actions
+from importlib.util import find_spec
+from . import chat, data, actions
+from .database import pool_stats
+from .actions.service import latency_stats as jira_latency_stats
+from utils.llm_cache import llm_cache_stats
+
+# The gmail blueprint is not part of every checkout; the rest of the API works without it
+if find_spec(f"{__name__}.gmail") is not None:
+    from . import gmail
+else:
+    print("backend.v1.gmail not found, the gmail endpoints are disabled.")
+    gmail = None
 
 bp = Blueprint('v1', __name__, url_prefix='/v1')
 
-bp.register_blueprint(gmail.bp)
+if gmail is not None:
+    bp.register_blueprint(gmail.bp)
 bp.register_blueprint(actions.bp)
 bp.register_blueprint(data.bp)
 bp.register_blueprint(chat.bp)
 
 @bp.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "UP", "message": "Flask is running!"}), 200
\ No newline at end of file
+    return jsonify({"status": "UP", "message": "Flask is running!", "db_pool": pool_stats(), "jira": jira_latency_stats(), "llm_cache": llm_cache_stats()}), 200
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Cached Jira context snapshots for /actions/get.
+
+Building the context handed to the actions prompt means fetching every project and every issue,
+which dwarfs everything but the LLM call itself. Since users triage bursts of emails against the
+same Jira state, we keep one rendered snapshot per cloud id:
+- Younger than JIRA_CONTEXT_TTL seconds (default 60): served as is.
+- Older, but younger than JIRA_CONTEXT_MAX_STALENESS seconds (default 600): served as is while
+  a background thread refreshes it.
+- Otherwise (or if missing): refreshed before returning.
+
+Each snapshot carries a version that increases when the rendered context changes, and after every
+invalidation (i.e. after we executed actions), even if the rendered context looks the same.
+
+The prompt itself does not get the whole snapshot: build_prompt_context compacts its issues and
+keeps the ones most relevant to the email (BM25 over key and summary) until JIRA_CONTEXT_TOKEN_BUDGET
+(default 4000, 0 for no limit) is used up.
+"""
+
+from backend.v1.llm import dict_to_str
+from collections import Counter
+from functools import lru_cache
+import threading
+import math
+import time
+import os
+import re
+
+
+class ContextSnapshot:
+    """The Jira context of one cloud id at a point in time, pre-rendered for the prompt."""
+
+    def __init__(self, cloud_id: str, version: int, data: dict, rendered: str, fetched_at: float, generation: int = 0):
+        self.cloud_id = cloud_id
+        self.version = version
+        # Invalidation count of the cloud id when the fetch started (see invalidate_context_snapshot)
+        self.generation = generation
+        self.data = data
+        self.rendered = rendered
+        self.fetched_at = fetched_at
+        self._index = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    @property
+    def index(self) -> "IssueIndex":
+        """The snapshot's issues, compacted and tokenized once for build_prompt_context."""
+        if self._index is None:
+            self._index = IssueIndex(self.data, self.rendered)
+        return self._index
+
+
+_snapshots = {}
+_generations = {}
+_refresh_locks = {}
+_refreshing = set()
+_lock = threading.Lock()
+
+
+def _refresh_lock(cloud_id) -> threading.RLock:
+    with _lock:
+        return _refresh_locks.setdefault(cloud_id, threading.RLock())
+
+
+def refresh_context_snapshot(client, attempts: int = 3) -> ContextSnapshot:
+    """
+    Fetch the client's Jira context and store it as the latest snapshot for its cloud id.
+
+    A fetch that was overtaken by an invalidation (we changed Jira while it ran) may hold
+    pre-change data, so it is not stored; the fetch is retried up to `attempts` times.
+    """
+    cloud_id = client.cloud_id
+    with _refresh_lock(cloud_id):
+        for attempt in range(attempts):
+            with _lock:
+                generation = _generations.get(cloud_id, 0)
+
+            data = client.get_context()
+            rendered = dict_to_str(data)
+
+            with _lock:
+                previous = _snapshots.get(cloud_id)
+                if previous is None:
+                    version = 1
+                elif previous.rendered == rendered and previous.generation == generation:
+                    version = previous.version
+                else:
+                    version = previous.version + 1
+
+                snapshot = ContextSnapshot(cloud_id, version, data, rendered, time.monotonic(), generation)
+                if _generations.get(cloud_id, 0) == generation:
+                    _snapshots[cloud_id] = snapshot
+                    break
+            print(f"Jira context for {cloud_id} was invalidated during the refresh, discarding it.")
+        else:
+            # Still racing with executions: hand this one out, but don't cache it
+            return snapshot
+
+    print(f"Jira context for {cloud_id} refreshed (version {version}).")
+    return snapshot
+
+
+def _refresh_in_background(client):
+    with _lock:
+        if client.cloud_id in _refreshing:
+            return
+        _refreshing.add(client.cloud_id)
+
+    def run():
+        try:
+            refresh_context_snapshot(client)
+        except Exception as e:
+            print(f"Error refreshing Jira context for {client.cloud_id}: {e}")
+        finally:
+            with _lock:
+                _refreshing.discard(client.cloud_id)
+
+    threading.Thread(target=run, name=f"jira-context-{client.cloud_id}", daemon=True).start()
+
+
+def get_context_snapshot(client) -> ContextSnapshot:
+    """Return the Jira context for the client's cloud id, refreshing it as described above."""
+    ttl = float(os.getenv("JIRA_CONTEXT_TTL", 60))
+    max_staleness = float(os.getenv("JIRA_CONTEXT_MAX_STALENESS", 600))
+
+    snapshot = _snapshots.get(client.cloud_id)
+    if snapshot is not None:
+        if snapshot.age < ttl:
+            return snapshot
+        if snapshot.age < max_staleness:
+            _refresh_in_background(client)
+            return snapshot
+
+    with _refresh_lock(client.cloud_id):
+        # Another request may have refreshed it while we waited on the lock
+        snapshot = _snapshots.get(client.cloud_id)
+        if snapshot is not None and snapshot.age < ttl:
+            return snapshot
+
+        return refresh_context_snapshot(client)
+
+
+def invalidate_context_snapshot(cloud_id):
+    """Expire the snapshot of a cloud id, e.g. after we changed its issues, so the next read refetches it."""
+    with _lock:
+        # Refreshes already in flight may have read Jira before the change; they are discarded
+        _generations[cloud_id] = _generations.get(cloud_id, 0) + 1
+        snapshot = _snapshots.get(cloud_id)
+        if snapshot is not None:
+            # Keep it (and its version) around, but old enough to force a synchronous refresh
+            snapshot.fetched_at = float("-inf")
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    # Cached either way: a failure (e.g. the encoding can't be downloaded) falls back to the estimate
+    # for the life of the process instead of retrying the download on every prompt
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model("gpt-4o")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable, estimating tokens from length instead: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of a prompt fragment: exact with tiktoken (and its encoding) available, otherwise ~4 characters per token."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_ISSUE_KEYS = re.compile(r"\b[A-Za-z][A-Za-z0-9]+-\d+\b")
+# Values get_project_params fills in when Jira has none, which tell the model nothing
+_PLACEHOLDERS = {None, "", "Unassigned", "No email available", "No due date", "No summary provided"}
+
+
+def _tokenize(text: str) -> list:
+    return _WORDS.findall(text.lower())
+
+
+def compact_issue(issue: dict) -> dict:
+    """
+    Drop what the prompt doesn't need from an issue of get_project_params: the numeric id (actions
+    reference the key), the assignee's email and any placeholder value.
+    """
+    compact = {"key": issue.get("key"), "summary": issue.get("summary")}
+    if issue.get("status") not in _PLACEHOLDERS:
+        compact["status"] = issue["status"]
+    if issue.get("duedate") not in _PLACEHOLDERS:
+        compact["duedate"] = issue["duedate"]
+
+    assignee = (issue.get("assignee") or {}).get("name")
+    if assignee not in _PLACEHOLDERS:
+        compact["assignee"] = assignee
+    return {field: value for field, value in compact.items() if value not in _PLACEHOLDERS}
+
+
+class IssueIndex:
+    """
+    The issues of a context, compacted, tokenized and priced in tokens, ready to be ranked against emails.
+    Built once per snapshot, so each request only pays for scoring.
+    """
+
+    def __init__(self, data: dict, rendered: str, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tokens = estimate_tokens(rendered)
+        self.issues = []
+        # Everything but the issues (project names, members, labels, priorities) is always kept
+        self.skeleton = {}
+
+        for project, project_data in data.items():
+            self.skeleton[project] = {field: value for field, value in project_data.items() if field != "issues"}
+            self.skeleton[project]["issues"] = []
+            for issue in project_data.get("issues", []):
+                compact = compact_issue(issue)
+                terms = Counter(_tokenize(f"{compact.get('key', '')} {compact.get('summary', '')}"))
+                self.issues.append({
+                    "project": project,
+                    "issue": compact,
+                    "id": str(issue.get("id")),
+                    "key": str(compact.get("key", "")).upper(),
+                    "terms": terms,
+                    "length": sum(terms.values()),
+                    # Each issue is one more item of a YAML list
+                    "cost": estimate_tokens(dict_to_str([compact]))
+                })
+
+        self.skeleton_tokens = estimate_tokens(dict_to_str(self.skeleton)) if self.skeleton else 0
+        self.average_length = sum(issue["length"] for issue in self.issues) / len(self.issues) if self.issues else 0
+        document_frequency = Counter(term for issue in self.issues for term in issue["terms"])
+        self.idf = {
+            term: math.log(1 + (len(self.issues) - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, text: str) -> list:
+        """BM25 score of every issue against the text; issues whose key the text mentions come first."""
+        query = set(_tokenize(text))
+        mentioned = {key.upper() for key in _ISSUE_KEYS.findall(text)}
+
+        scores = []
+        for issue in self.issues:
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * issue["length"] / (self.average_length or 1))
+            for term in query:
+                frequency = issue["terms"].get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if issue["key"] in mentioned:
+                score += 1000
+            scores.append(score)
+        return scores
+
+
+def build_prompt_context(snapshot: ContextSnapshot, email: str, budget: int = None, retriever=None):
+    """
+    Render the snapshot for the actions prompt: issues compacted and ranked by relevance to the email,
+    keeping as many as fit in the token budget (JIRA_CONTEXT_TOKEN_BUDGET by default, 0 for no limit).
+
+    retriever, if given, is called with the email and returns [{"id", "score"}] of related issues
+    (e.g. utils.embeddings.search_issues); their similarity is added to the keyword score.
+
+    Returns the rendered context and its size before and after.
+    """
+    budget = int(os.getenv("JIRA_CONTEXT_TOKEN_BUDGET", 4000)) if budget is None else budget
+    index = snapshot.index
+
+    scores = index.scores(email)
+    if retriever is not None:
+        related = {str(result["id"]): result["score"] for result in retriever(email)}
+        # Cosine similarities are at most 1, BM25 scores a few units: scale them to compete
+        scores = [score + 10 * related.get(issue["id"], 0.0) for score, issue in zip(scores, index.issues)]
+    # Most relevant first; ties (e.g. all zero) keep Jira's order
+    ranking = sorted(range(len(index.issues)), key=lambda i: -scores[i])
+
+    used = index.skeleton_tokens
+    kept = []
+    for i in ranking:
+        if budget and used + index.issues[i]["cost"] > budget:
+            continue
+        used += index.issues[i]["cost"]
+        kept.append(i)
+
+    context = {project: dict(project_data, issues=[]) for project, project_data in index.skeleton.items()}
+    for i in kept:
+        context[index.issues[i]["project"]]["issues"].append(index.issues[i]["issue"])
+
+    rendered = dict_to_str(context)
+    stats = {
+        "budget": budget,
+        "tokens_before": index.tokens,
+        "tokens_after": estimate_tokens(rendered),
+        "issues_before": len(index.issues),
+        "issues_after": len(kept)
+    }
+    return rendered, stats
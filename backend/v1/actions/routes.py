@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from backend.v1.actions.service import generate_actions, execute_action, JiraClient
+from backend.v1.actions.service import generate_actions, execute_action, execute_actions, JiraClient
 from backend.v1.auth import jira_auth_required
 
 bp = Blueprint('actions', __name__, url_prefix='/actions')
@@ -27,14 +27,15 @@ def actions():
     except Exception as e:
         return jsonify({"error": f"Error generating actions: {e}"}), 500
 
-    return jsonify({"actions": actions}), 200
+    return jsonify({"actions": [action.to_dict() for action in actions]}), 200
 
 @bp.route('/execute', methods=['POST'])
 @jira_auth_required
 def execute():
     """
     Expected Payload:
-    - action: dict with the action to be executed
+    - action: dict with the action to be executed ({"operation", "issue", "fields"} as returned
+      by /actions/get), or the action as a call string
     - jira-cloud-id: str with the jira cloud id
     - jira-auth-token: dict with the jira auth token
     """
@@ -54,3 +55,34 @@ def execute():
         return jsonify({"error": f"Error executing action: {e}"}), 500
 
     return jsonify({"message": "Action executed successfully"}), 200
+
+@bp.route('/execute/batch', methods=['POST'])
+@jira_auth_required
+def execute_batch():
+    """
+    Expected Payload:
+    - actions: list of actions to be executed (in the output format of /actions/get, or call strings)
+    - jira-cloud-id: str with the jira cloud id
+    - jira-auth-token: dict with the jira auth token
+
+    Actions on different issues run concurrently; the response lists each action's outcome and timing.
+    """
+    data = request.get_json()
+    actions = data.get('actions')
+    jira_cloud_id = data.get('jira-cloud-id')
+    jira_auth_token = data.get('jira-auth-token')
+
+    if not isinstance(actions, list) or not all(isinstance(action, (str, dict)) for action in actions):
+        return jsonify({"error": "actions must be a list of actions"}), 400
+
+    try:
+        jc = JiraClient(jira_cloud_id, jira_auth_token)
+    except Exception as e:
+        return jsonify({"error": f"Jira authentic error: {e}"}), 401
+
+    try:
+        outcome = execute_actions(actions, jc)
+    except Exception as e:
+        return jsonify({"error": f"Error executing actions: {e}"}), 500
+
+    return jsonify(outcome), 200 if outcome["failed"] == 0 else 207
@@ -1,6 +1,114 @@
 from backend.v1.llm import generate_actions as ga
+from backend.v1.database import RdsManager
+from backend.v1.actions.context import get_context_snapshot, invalidate_context_snapshot, build_prompt_context
+from utils.cache import TTLCache, content_hash
+from utils.embeddings import search_issues
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
 import requests
+import threading
+import datetime
+import inspect
+import ast
+import time
 import json
+import os
+import re
+
+"""
+HTTP plumbing shared by every JiraClient.
+
+Clients for the same cloud id share one requests.Session, so connections to api.atlassian.com
+are kept alive across calls and requests. Every call goes through JiraClient._request, which applies
+timeouts, retries rate-limited (429) and, for idempotent methods, transient 5xx/connection failures
+with backoff, and records per-endpoint latency.
+
+Tunable through the environment:
+- JIRA_TIMEOUT: read timeout in seconds (default 30; connect timeout is 5)
+- JIRA_MAX_RETRIES: retries per call (default 3)
+- JIRA_MAX_RETRY_DELAY: cap in seconds on a single backoff / Retry-After wait (default 30)
+- JIRA_POOL_SIZE: keep-alive connections per cloud id (default 16)
+"""
+
+_IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE", "HEAD"}
+_RETRYABLE_STATUSES = {502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_latency = {}
+_latency_lock = threading.Lock()
+
+
+def get_session(cloud_id) -> requests.Session:
+    """
+    Return the process-wide session for a Jira cloud id, creating it on first use.
+
+    The session is shared by every user of the cloud id for its connection pool only: it never
+    stores cookies (which Jira sets per bearer token), and credentials are passed per request.
+    """
+    with _sessions_lock:
+        session = _sessions.get(cloud_id)
+        if session is None:
+            pool_size = int(os.getenv("JIRA_POOL_SIZE", 16))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            session.mount("https://", adapter)
+            _sessions[cloud_id] = session
+        return session
+
+
+def _record_latency(endpoint, elapsed_ms, error=False):
+    with _latency_lock:
+        stats = _latency.setdefault(endpoint, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["errors"] += int(error)
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def latency_stats() -> dict:
+    """Per-endpoint call counts, error counts and latencies (ms) of every Jira request made by this process."""
+    with _latency_lock:
+        return {
+            endpoint: dict(stats, avg_ms=stats["total_ms"] / stats["count"] if stats["count"] else 0.0)
+            for endpoint, stats in _latency.items()
+        }
+
+
+def _retry_delay(response, attempt, max_delay):
+    """Honour Retry-After (seconds or HTTP date) if present, otherwise back off exponentially."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                delay = (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0), max_delay)
+
+    return min(0.5 * 2 ** attempt, max_delay)
+
+"""
+Jira metadata cache.
+
+Project lists and transition ids rarely change but were refetched on every issue creation and
+status change. They are cached per cloud id for JIRA_METADATA_TTL seconds (default 300);
+call JiraClient.invalidate_metadata() after changing projects or workflows.
+"""
+
+_metadata_cache = TTLCache(maxsize=1024, ttl=float(os.getenv("JIRA_METADATA_TTL", 300)))
+_METADATA_KINDS = ("projects", "project_keys", "transition_ids")
+# (cloud id, status) whose transition screen refused our fields, so updates go straight to PUT + transition
+_transition_refusals = TTLCache(maxsize=1024, ttl=float(os.getenv("JIRA_METADATA_TTL", 300)))
+
 
 class JiraClient: 
     def __init__(self, cloud_id, access_token):
@@ -10,66 +118,141 @@ class JiraClient:
             "Authorization": f"Bearer {self.access_token}",
             "Accept": "application/json"
         }
+        self.session = get_session(cloud_id)
+        self.timeout = (5, float(os.getenv("JIRA_TIMEOUT", 30)))
+        self.max_retries = int(os.getenv("JIRA_MAX_RETRIES", 3))
+        self.max_retry_delay = float(os.getenv("JIRA_MAX_RETRY_DELAY", 30))
 
         self.project_api_path = "rest/api/3/project"
         self.search_api_path = "rest/api/3/search"
         self.create_issue_path = "rest/api/3/issue"
 
+        # Jira caps search pages at 100 issues
+        self.page_size = int(os.getenv("JIRA_PAGE_SIZE", 100))
+        # Upper bound on parallel requests a single call fans out to
+        self.max_concurrency = int(os.getenv("JIRA_MAX_CONCURRENCY", 8))
+        # Jira's bulk create accepts at most 50 issues per request
+        self.bulk_size = min(int(os.getenv("JIRA_BULK_SIZE", 50)), 50)
+
+    def _request(self, method, path, endpoint=None, **kwargs):
+        """
+        Send a request to the Jira REST API over the shared session.
+
+        Parameters:
+            method -> str: HTTP method
+            path -> str: API path relative to the cloud id, e.g. "rest/api/3/project"
+            endpoint -> str: Label for latency stats when the path embeds ids, e.g. "rest/api/3/issue/{issue}"
+        """
+        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{path}"
+        endpoint = f"{method} {endpoint or path}"
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, headers=self.headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                _record_latency(endpoint, (time.perf_counter() - start) * 1000, error=True)
+                # A POST may have reached Jira, so only idempotent calls are retried
+                if method not in _IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                delay = _retry_delay(None, attempt, self.max_retry_delay)
+                print(f"{endpoint} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                _record_latency(endpoint, (time.perf_counter() - start) * 1000, error=response.status_code >= 400)
+                retryable = response.status_code == 429 or (
+                    response.status_code in _RETRYABLE_STATUSES and method in _IDEMPOTENT_METHODS
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = _retry_delay(response, attempt, self.max_retry_delay)
+                print(f"{endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            time.sleep(delay)
+            attempt += 1
 
     def projects(self):
         """
         Returns all jira projects as a python list 
         """
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.project_api_path}"
+        cached = _metadata_cache.get((self.cloud_id, "projects"))
+        if cached is not None:
+            return cached
 
-        response = requests.get(url, headers=self.headers)
+        response = self._request("GET", self.project_api_path)
         response.raise_for_status()
 
         data = response.json()
+        _metadata_cache.set((self.cloud_id, "projects"), data)
         return data
 
+    def invalidate_metadata(self):
+        """Drop the cached projects, project keys and transitions of this cloud id."""
+        for kind in _METADATA_KINDS:
+            _metadata_cache.pop((self.cloud_id, kind))
+
 
-    def get_all_issues(self):
+    def get_all_issues(self, fields=None):
         """
         Returns all issues in an account as a python dict 
         """
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.search_api_path}"
-
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-
-        data = response.json()
-        return data
+        return self.search_with_jql(None, fields=fields)
 
-    def search_with_jql(self, jql):
+    def iter_issues(self, jql=None, fields=None, page_size=None):
         """
-        Perform search with JQL-- Jira's inbuild query language. 
-        This function returns a string.
+        Perform a paginated search with JQL, yielding issues one page at a time.
+        Only one page is held in memory, so callers can walk large projects in constant memory.
+
+        Parameters:
+            jql -> str: JQL query, or None for every issue in the account
+            fields -> str[]: Issue fields to return, e.g. ["summary", "status"]. Defaults to all navigable fields.
+            page_size -> int: Issues requested per page (defaults to JIRA_PAGE_SIZE, max 100)
         """
+        page_size = page_size or self.page_size
 
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.search_api_path}"
+        start_at = 0
+        while True:
+            params = {
+                "startAt": start_at,
+                "maxResults": page_size
+            }
+            if jql:
+                params["jql"] = jql
+            if fields:
+                params["fields"] = ",".join(fields)
 
-        params = {
-            "jql" : jql
-        }
+            response = self._request("GET", self.search_api_path, params=params)
+            response.raise_for_status()
 
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
+            page = response.json()
+            issues = page.get("issues", [])
+            yield from issues
 
-        data = response.json()
-        return data
+            start_at += len(issues)
+            if not issues or start_at >= page.get("total", 0):
+                break
+
+    def search_with_jql(self, jql, fields=None, page_size=None):
+        """
+        Perform search with JQL-- Jira's inbuild query language. 
+        Walks every page and returns a dict shaped like Jira's search response.
+        Use iter_issues to stream the results instead.
+        """
+        issues = list(self.iter_issues(jql, fields=fields, page_size=page_size))
+        return {"issues": issues, "total": len(issues)}
 
     def get_userid_by_name(self, name):
         """
         Takes in a user's name and performs a JQL search on it.
         This function returns a string.
         """
-        payload = self.search_with_jql(f"assignee = \"{name}\"")
+        # A single issue is enough to read the assignee's account id
+        issues = self.iter_issues(f"assignee = \"{name}\"", fields=["assignee"], page_size=1)
         print("1")
-        # json_data = json.loads(payload)
-        json_data = payload
+        issue = next(issues)
         print("2")
-        user_id = json_data['issues'][0]['fields']['assignee']['accountId']
+        user_id = issue['fields']['assignee']['accountId']
         print("3")
         user_id = user_id
         print("4")
@@ -94,29 +277,101 @@ class JiraClient:
         """
         Creates a jira issue of a given type and assign it to a given user.
         """
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.create_issue_path}"
-
         print("\n\n\nIM HERE!!!!!!!!\n\n")
         print("Project is ", project)
         project = self.get_project_key_by_name(project)
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
+        data = {
+            "fields": self._issue_fields(project, summary, description, assignee, priority, issue_type, due_date, labels)
         }
 
-        data = {
-            "fields": {
-                "project": {
-                    "key": project
-                },
-                "summary": summary
-            }
+        response = self._request("POST", self.create_issue_path, json=data)
+        print(f"\n\n{response.text}")
+        response.raise_for_status()
+
+        return response.json()
+
+
+    def create_issues(self, issues):
+        """
+        Creates several jira issues through the bulk endpoint, up to bulk_size per request.
+        issues is a list of dicts with create_issue's parameters. Project names are resolved once.
+
+        Returns one entry per input, in order: {"ok", "issue" (id, key, self), "error"}.
+        A failing request only fails the inputs it carried; it never raises.
+        """
+        results = [{"ok": False, "issue": None, "error": None} for _ in issues]
+        try:
+            project_keys = {name: self.get_project_key_by_name(name) for name in {issue.get("project") for issue in issues}}
+        except requests.RequestException as e:
+            print(f"Error resolving project keys: {e}")
+            for result in results:
+                result["error"] = f"Could not resolve project keys: {e}"
+            return results
+
+        payloads = []
+        for index, issue in enumerate(issues):
+            params = dict(issue)
+            project = project_keys.get(params.pop("project", None))
+            if project is None:
+                results[index]["error"] = f"Unknown project {issue.get('project')!r}"
+                continue
+            try:
+                payloads.append((index, {"fields": self._issue_fields(project, **params)}))
+            except TypeError as e:
+                results[index]["error"] = f"Invalid issue: {e}"
+
+        for start in range(0, len(payloads), self.bulk_size):
+            chunk = payloads[start:start + self.bulk_size]
+            try:
+                response = self._request(
+                    "POST",
+                    f"{self.create_issue_path}/bulk",
+                    json={"issueUpdates": [payload for _, payload in chunk]}
+                )
+                # Jira answers 400 with the same body when every issue of the request failed
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+                if not isinstance(body, dict) or (response.status_code != 201 and not isinstance(body.get("errors"), list)):
+                    response.raise_for_status()
+                    raise requests.HTTPError(f"Unexpected bulk create response ({response.status_code}): {response.text[:200]}")
+            except requests.RequestException as e:
+                # Only this chunk failed; the issues of earlier chunks exist and are still reported as created
+                print(f"Error bulk creating issues: {e}")
+                for index, _ in chunk:
+                    results[index]["error"] = str(e)
+                continue
+
+            # Errors point at their element's position in the request; created issues come back in order
+            failed = {}
+            for error in body.get("errors") or []:
+                element = error.get("elementErrors", {})
+                messages = element.get("errorMessages", []) + [f"{field}: {message}" for field, message in element.get("errors", {}).items()]
+                failed[error.get("failedElementNumber")] = "; ".join(messages) or f"HTTP {error.get('status')}"
+
+            created = iter(body.get("issues") or [])
+            for position, (index, _) in enumerate(chunk):
+                if position in failed:
+                    results[index]["error"] = failed[position]
+                else:
+                    results[index].update(ok=True, issue=next(created, None))
+
+        print(f"Bulk created {sum(result['ok'] for result in results)}/{len(issues)} issues.")
+        return results
+
+    def _issue_fields(self, project, summary, description=None, assignee=None, priority=None, issue_type=None, due_date=None, labels=None):
+        """The "fields" of a new issue, shared by create_issue and create_issues. project is a project key."""
+        fields = {
+            "project": {
+                "key": project
+            },
+            "summary": summary
         }
 
         if description:
-            data["fields"]["description"] = {
+            fields["description"] = {
                 "type": "doc",
                 "version": 1,
                 "content": [
@@ -133,31 +388,27 @@ class JiraClient:
             }
 
         if assignee:
-            data["fields"]["assignee"] = {
+            fields["assignee"] = {
                 "id": assignee
             }
 
         if priority:
-            data["fields"]["priority"] = {
+            fields["priority"] = {
                 "name": priority
             }
 
         if due_date:
-            data["fields"]["duedate"] = due_date
+            fields["duedate"] = due_date
 
         if issue_type:
-            data["fields"]["issuetype"] = {
+            fields["issuetype"] = {
                 "name": issue_type
             }
 
         if labels:
-            data["fields"]["labels"] = labels
+            fields["labels"] = labels
 
-        response = requests.post(url, headers=headers, json=data)
-        print(f"\n\n{response.text}")
-        response.raise_for_status()
-
-        return response.json()
+        return fields
 
 
     def update_issue(self, issue, due_date=None, assignee=None, status=None, priority=None):
@@ -165,14 +416,6 @@ class JiraClient:
         Updates a current jira issue with a due date, status, and priority.
         issue parameter can be either an ID or the Name of the issue (also known as the "Key")
         """
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.create_issue_path}/{issue}"
-
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
         data = {
             "fields": {}
         }
@@ -190,7 +433,28 @@ class JiraClient:
         if due_date:
             data["fields"]["duedate"] = due_date
 
-        response = requests.put(url, headers=headers, json=data)
+        if status:
+            if not data["fields"]:
+                return self.transfer_issue(issue, status)
+
+            # Transition and update in one request. Jira rejects (400) fields that are not on
+            # the transition's screen, in which case we fall back to an update plus a transition,
+            # and remember to do so directly for this status.
+            if (self.cloud_id, status) not in _transition_refusals:
+                response = self._transition(issue, status, fields=data["fields"])
+                if response.status_code != 400:
+                    if response.status_code != 204:
+                        response.raise_for_status()
+                    return issue
+                print(f"Jira refused fields on the transition of {issue}, updating them separately: {response.text}")
+                _transition_refusals.set((self.cloud_id, status), True)
+
+        response = self._request(
+            "PUT",
+            f"{self.create_issue_path}/{issue}",
+            endpoint=f"{self.create_issue_path}/{{issue}}",
+            json=data
+        )
         print(response.text)
         if response.status_code != 204:
             response.raise_for_status()
@@ -208,55 +472,71 @@ class JiraClient:
         Default statuses are TO DO, IN PROGRESS, and DONE.
         But more can be manually added. 
         """
+        response = self._transition(issue, status)
+        print("Response is ", response)
+        if response.status_code != 204:
+            response.raise_for_status()
 
-        # Since status comes in a name form, we must convert it to an ID
-        transitions_json = self.get_transitions()
-        transition_as_id = self.get_transition_id_from_name(transitions_json, status)
 
+        return issue
 
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.create_issue_path}/{issue}/transitions"
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+    def _transition(self, issue, status, fields=None):
+        """POST a transition to the given status, optionally setting fields in the same request."""
+
+        # Since status comes in a name form, we must convert it to an ID
+        transition_as_id = self.get_transition_ids().get(status)
+        if transition_as_id is None:
+            # The workflow may have changed since we cached it
+            _metadata_cache.pop((self.cloud_id, "transition_ids"))
+            transition_as_id = self.get_transition_ids().get(status)
 
-        data = json.dumps({
+        data = {
             "transition": {
                 "id": transition_as_id
             } 
-        })
-
-
-        response = requests.post(url, headers=headers, data=data)
-        print("Response is ", response)
-        if response.status_code != 204:
-            response.raise_for_status()
+        }
+        if fields:
+            data["fields"] = fields
 
-
-        return issue
+        return self._request(
+            "POST",
+            f"{self.create_issue_path}/{issue}/transitions",
+            endpoint=f"{self.create_issue_path}/{{issue}}/transitions",
+            json=data
+        )
 
 
     def get_transitions(self):
         """Get allowed transitions for an issue"""
         issue = "KAN-3"
 
-        url = f"https://api.atlassian.com/ex/jira/{self.cloud_id}/{self.create_issue_path}/{issue}/transitions"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
-
-
-        response = requests.get(url, headers=headers)
+        response = self._request(
+            "GET",
+            f"{self.create_issue_path}/{issue}/transitions",
+            endpoint=f"{self.create_issue_path}/{{issue}}/transitions"
+        )
         response.raise_for_status()
 
         data = response.json()
         return data
 
+    def get_transition_ids(self):
+        """
+        Returns a (cached) mapping of transition names to transition IDs.
+        """
+        cached = _metadata_cache.get((self.cloud_id, "transition_ids"))
+        if cached is not None:
+            return cached
+
+        transitions_json = self.get_transitions()
+        transition_ids = {
+            transition['name']: transition['id']
+            for transition in transitions_json.get('transitions', [])
+        }
+        _metadata_cache.set((self.cloud_id, "transition_ids"), transition_ids)
+        return transition_ids
+
     def get_transition_id_from_name(self, transitions_json, status_name):
         """
         Retrieves the transition ID for a given status name.
@@ -288,64 +568,84 @@ class JiraClient:
         Returns:
             str: JSON string containing structured data on projects and associated issues.
         """
+        return json.dumps(self.get_context())
+
+    def get_context(self):
+        """
+        Same as get_allowed_params, but returns the python dict.
+
+        Projects are searched concurrently (at most JIRA_MAX_CONCURRENCY at a time, default 8),
+        but the output keeps the order returned by projects().
+        """
         projects = self.projects()  
+        project_names = [project['name'] for project in projects]
         output = {}
 
-        for project in projects:
-            project_name = project['name']
-            project_data = {
-                "issues": [],
-                "members": set(),
-                "labels": set(),
-                "priorities": set()
-            }
+        if not project_names:
+            return output
 
-            # Extract issues for each project using JQL or an appropriate method
-            project_issues = self.search_with_jql(f'project = "{project_name}"')
-            for issue in project_issues['issues']:
-                assignee_data = issue['fields'].get('assignee')
-                simplified_issue = {
-                    "id": issue.get('id'),
-                    "key": issue.get('key'),
-                    "summary": issue['fields'].get('summary', 'No summary provided'),
-                    "status": issue['fields'].get('status', {}).get('name', 'Unknown status'),
-                    "duedate": issue['fields'].get('duedate', 'No due date'),
-                    "assignee": {
-                        "name": assignee_data.get('displayName', 'Unassigned') if assignee_data else 'Unassigned',
-                        "email": assignee_data.get('emailAddress', 'No email available') if assignee_data else 'No email available'
-                    }
-                }
-                project_data['issues'].append(simplified_issue)
+        workers = min(self.max_concurrency, len(project_names))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jira-params") as executor:
+            # map yields results in input order regardless of completion order
+            for project_name, project_data in zip(project_names, executor.map(self.get_project_params, project_names)):
+                output[project_name] = project_data
 
-                if assignee_data:
-                    project_data['members'].add(assignee_data['displayName'])
+        return output
 
-                project_data['labels'].update(issue['fields'].get('labels', []))
-                if issue['fields'].get('priority'):
-                    project_data['priorities'].add(issue['fields']['priority']['name'])
+    def get_project_params(self, project_name):
+        """
+        Extract the issues, members, labels and priorities of a single project.
+        """
+        project_data = {
+            "issues": [],
+            "members": set(),
+            "labels": set(),
+            "priorities": set()
+        }
 
-            project_data['members'] = list(project_data['members'])
-            project_data['labels'] = list(project_data['labels'])
-            project_data['priorities'] = list(project_data['priorities'])
+        # Extract issues for each project using JQL or an appropriate method
+        project_issues = self.iter_issues(
+            f'project = "{project_name}"',
+            fields=["summary", "status", "duedate", "assignee", "labels", "priority"]
+        )
+        for issue in project_issues:
+            assignee_data = issue['fields'].get('assignee')
+            simplified_issue = {
+                "id": issue.get('id'),
+                "key": issue.get('key'),
+                "summary": issue['fields'].get('summary', 'No summary provided'),
+                "status": issue['fields'].get('status', {}).get('name', 'Unknown status'),
+                "duedate": issue['fields'].get('duedate', 'No due date'),
+                "assignee": {
+                    "name": assignee_data.get('displayName', 'Unassigned') if assignee_data else 'Unassigned',
+                    "email": assignee_data.get('emailAddress', 'No email available') if assignee_data else 'No email available'
+                }
+            }
+            project_data['issues'].append(simplified_issue)
 
-            output[project_name] = project_data
+            if assignee_data:
+                project_data['members'].add(assignee_data['displayName'])
 
-        return json.dumps(output)
+            project_data['labels'].update(issue['fields'].get('labels', []))
+            if issue['fields'].get('priority'):
+                project_data['priorities'].add(issue['fields']['priority']['name'])
 
-    def get_project_key_by_name(self, project_name):
-        projects = self.projects()
+        # Sorted so the same Jira state always renders the same context
+        project_data['members'] = sorted(project_data['members'])
+        project_data['labels'] = sorted(project_data['labels'])
+        project_data['priorities'] = sorted(project_data['priorities'])
 
-        for project in projects:
-            if project['name'] == project_name:
-                return project['key']
+        return project_data
 
-        return None
+    def get_project_key_by_name(self, project_name):
+        project_keys = _metadata_cache.get((self.cloud_id, "project_keys"))
+        if project_keys is None:
+            project_keys = {project['name']: project['key'] for project in self.projects()}
+            _metadata_cache.set((self.cloud_id, "project_keys"), project_keys)
 
-def generate_actions(email: str, client: JiraClient):
-    context = client.get_allowed_params()
-    context = json.loads(context)
+        return project_keys.get(project_name)
 
-    funcs = """
+_FUNCS = """
         ["name: create_issue
         required params: project, summary, priority
         optional params: description, assignee, due_date",
@@ -354,18 +654,319 @@ def generate_actions(email: str, client: JiraClient):
         optional params: due_date, assignee, status, priority"]
         """
 
-    actions = ga(email, context, funcs)
+# JiraClient methods an LLM-suggested action may call
+_ACTIONS = ("create_issue", "update_issue", "transfer_issue")
+# Operations on an existing issue, which can be merged into a single update_issue call
+_ISSUE_UPDATES = ("update_issue", "transfer_issue")
+_ACTION_CALL = re.compile(r"\b(" + "|".join(_ACTIONS) + r")\s*\(")
+
+def _bind(name, args=(), kwargs=None):
+    """Check a call against the whitelist and the method's signature; return its named params."""
+    if name not in _ACTIONS:
+        raise ValueError(f"Unsupported operation {name!r}")
+    try:
+        params = inspect.signature(getattr(JiraClient, name)).bind(None, *args, **(kwargs or {})).arguments
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for {name}: {e}")
+
+    params.pop("self")
+    return {param: value for param, value in params.items() if value is not None}
+
+def parse_action(action: str):
+    """
+    Parse an action string such as 'update_issue(issue="KAN-1", status="Done")' into (name, params)
+    without evaluating it: only whitelisted methods with literal arguments are accepted.
+    """
+    try:
+        call = ast.parse(action.strip(), mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Unparsable action {action!r}: {e}")
+
+    if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+        raise ValueError(f"Unsupported action {action!r}")
+
+    try:
+        args = [ast.literal_eval(arg) for arg in call.args]
+        kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in call.keywords if kw.arg is not None}
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid arguments in action {action!r}: {e}")
+    if len(kwargs) != len(call.keywords):
+        raise ValueError(f"Invalid arguments in action {action!r}: ** arguments are not allowed")
+
+    return call.func.id, _bind(call.func.id, args, kwargs)
+
+class Action:
+    """
+    A Jira operation: the JiraClient method to call, the issue it targets (None when creating one)
+    and the remaining parameters.
+
+    Example:
+
+        .. code-block:: python
 
+            action = Action.parse('update_issue(issue="KAN-1", status="Done")')
+            action.to_dict()  # -> {"operation": "update_issue", "issue": "KAN-1", "fields": {"status": "Done"}}
+            action.execute(client)
+    """
+
+    def __init__(self, operation: str, issue: str = None, fields: dict = None):
+        self.operation = operation
+        self.issue = issue
+        self.fields = fields or {}
+
+    @classmethod
+    def parse(cls, value) -> "Action":
+        """Build an action from an action string (LLM output) or its dict form (see to_dict)."""
+        if isinstance(value, Action):
+            return value
+
+        if isinstance(value, str):
+            name, params = parse_action(value)
+        elif isinstance(value, dict):
+            name = value.get("operation")
+            fields = value.get("fields") or {}
+            if not isinstance(fields, dict):
+                raise ValueError(f"Invalid fields in action {value!r}: expected an object")
+            params = dict(fields)
+            if value.get("issue") is not None:
+                params["issue"] = value["issue"]
+            params = _bind(name, kwargs=params)
+        else:
+            raise ValueError(f"Unsupported action {value!r}")
+
+        issue = params.pop("issue", None)
+        return cls(name, str(issue) if issue is not None else None, params)
+
+    def merge(self, other: "Action") -> "Action":
+        """Combine two updates of the same issue into one update_issue; later fields win."""
+        return Action("update_issue", self.issue, {**self.fields, **other.fields})
+
+    def execute(self, client: JiraClient):
+        params = dict(self.fields)
+        if self.issue is not None:
+            params["issue"] = self.issue
+        return getattr(client, self.operation)(**params)
+
+    def to_dict(self) -> dict:
+        return {"operation": self.operation, "issue": self.issue, "fields": self.fields}
+
+    def __eq__(self, other):
+        return isinstance(other, Action) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        params = ([f"issue={self.issue!r}"] if self.issue is not None else []) + [f"{k}={v!r}" for k, v in self.fields.items()]
+        return f"{self.operation}({', '.join(params)})"
+
+def _find_calls(text: str) -> list:
+    """Pull the action calls out of LLM output that is not a valid Python literal (e.g. unescaped quotes)."""
+    calls = []
+    for match in _ACTION_CALL.finditer(text):
+        # The call ends at the first closing parenthesis that makes it parse
+        for end in (i for i, char in enumerate(text[match.start():], match.start()) if char == ")"):
+            candidate = text[match.start():end + 1]
+            try:
+                ast.parse(candidate, mode="eval")
+            except SyntaxError:
+                continue
+            calls.append(candidate)
+            break
+    return calls
+
+def parse_actions(output) -> list:
+    """Turn generate_actions' LLM output (a list, or its text) into a list of Actions, skipping invalid ones."""
+    if not output:
+        return []
+
+    if isinstance(output, str):
+        try:
+            items = ast.literal_eval(output.strip())
+        except (ValueError, TypeError, SyntaxError):
+            items = _find_calls(output)
+        if not isinstance(items, (list, tuple)):
+            items = [items]
+    else:
+        items = output
+
+    actions = []
+    for item in items:
+        try:
+            actions.append(Action.parse(item))
+        except ValueError as e:
+            print(f"Skipping action: {e}")
     return actions
 
-def execute_action(action, client: JiraClient):
+def merge_actions(actions: list) -> list:
+    """
+    Collapse a sequence of actions into the fewest calls: identical actions run once, and consecutive
+    update_issue / transfer_issue on the same issue become one update_issue (so one Jira request).
+    Takes (index, Action) pairs and returns (indices, Action) pairs.
+    """
+    merged = []
+    for index, action in actions:
+        if merged:
+            indices, previous = merged[-1]
+            if previous == action:
+                indices.append(index)
+                continue
+            if (action.issue is not None and action.issue == previous.issue
+                    and action.operation in _ISSUE_UPDATES and previous.operation in _ISSUE_UPDATES):
+                indices.append(index)
+                merged[-1] = (indices, previous.merge(action))
+                continue
+        merged.append(([index], action))
+    return merged
+
+# Actions generated per (cloud id, Jira context version, email content hash). Keying on the context
+# version means a repeated email is only answered from cache while Jira has not changed under it.
+_generated_actions = TTLCache(
+    maxsize=int(os.getenv("DEDUP_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("ACTIONS_DEDUP_TTL", 3600))
+)
+
+def generate_actions(email: str, client: JiraClient, schema: str = None) -> list:
+    """
+    Suggest Jira actions for an email, as a list of validated Actions.
+    With the user's schema, issues similar to the email in its embedding index are favoured in the context.
+    """
+    # Cached per cloud id and already rendered for the prompt
+    snapshot = get_context_snapshot(client)
+    print(f"Using Jira context version {snapshot.version} ({snapshot.age:.0f}s old)")
+
+    key = (client.cloud_id, snapshot.version, schema, content_hash(email))
+    actions = _generated_actions.get(key)
+    if actions is not None:
+        print("Email already seen against this Jira context, returning cached actions.")
+        return actions
+
+    # Only the issues relevant to this email, within the prompt's token budget
+    retriever = (lambda text: search_issues(schema, text, k=20)) if schema else None
+    context, stats = build_prompt_context(snapshot, email, retriever=retriever)
+    print(
+        f"Jira context compacted from {stats['tokens_before']} to {stats['tokens_after']} tokens "
+        f"({stats['issues_after']}/{stats['issues_before']} issues, budget {stats['budget'] or 'unlimited'})"
+    )
+
+    actions = parse_actions(ga(email, context, _FUNCS))
+    _generated_actions.set(key, actions)
+
+    return actions
 
+def execute_action(action, client: JiraClient):
+    """Execute one action, given as an Action, an action string or its dict form."""
     try:
-        print("\n\nTrying eval", f"client.{action}")
-        eval("client." + action)
-        print("Did eval!")
+        action = Action.parse(action)
+        print(f"Executing {action!r}")
+        return action.execute(client)
     except Exception as e:
         print(e)
-        raise Exception(f"Error executing action during eval step: {e}")
+        raise Exception(f"Error executing action: {e}")
+    finally:
+        # Whatever happened, Jira may have changed under the cached context
+        invalidate_context_snapshot(client.cloud_id)
+
+def execute_actions(actions: list, client: JiraClient, max_concurrency: int = None):
+    """
+    Execute a list of actions (Actions, action strings or their dict form) with one client.
+
+    Updates of the same issue are merged into one call and identical actions run once (see merge_actions).
+    New issues are created together through the bulk endpoint (see JiraClient.create_issues).
+    Actions on different issues run concurrently (up to max_concurrency, default the client's),
+    while the calls on one issue run one after the other, in the order given.
+    Returns the per-action outcome and timing, in input order; merged actions share their outcome.
+    """
+    started = time.perf_counter()
+    results = [
+        {"action": action if isinstance(action, (str, dict)) else repr(action), "ok": False, "result": None, "error": None, "elapsed_ms": 0.0, "merged": False}
+        for action in actions
+    ]
+
+    # Group the valid actions by the issue they touch, and collect the (distinct) creations
+    groups = {}
+    creations = {}
+    for index, action in enumerate(actions):
+        try:
+            action = Action.parse(action)
+        except ValueError as e:
+            results[index]["error"] = str(e)
+            continue
+
+        if action.operation == "create_issue":
+            key = json.dumps(action.fields, sort_keys=True, default=str)
+            creations.setdefault(key, ([], action))[0].append(index)
+        else:
+            groups.setdefault(action.issue, []).append((index, action))
+
+    merged_groups = [merge_actions(group) for group in groups.values()]
+
+    def run(calls):
+        for indices, action in calls:
+            start = time.perf_counter()
+            outcome = {"ok": False, "result": None, "error": None}
+            try:
+                outcome.update(ok=True, result=action.execute(client))
+            except Exception as e:
+                print(f"Error executing action {action!r}: {e}")
+                outcome["error"] = str(e)
+            outcome["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            for index in indices:
+                results[index].update(outcome, merged=len(indices) > 1)
+
+    def create(calls):
+        start = time.perf_counter()
+        try:
+            outcomes = client.create_issues([action.fields for _, action in calls])
+        except Exception as e:
+            print(f"Error bulk creating issues: {e}")
+            outcomes = [{"ok": False, "issue": None, "error": str(e)}] * len(calls)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        for (indices, _), outcome in zip(calls, outcomes):
+            for index in indices:
+                results[index].update(
+                    ok=outcome["ok"], result=outcome["issue"], error=outcome["error"],
+                    elapsed_ms=elapsed_ms, merged=len(indices) > 1
+                )
+
+    jobs = [(run, calls) for calls in merged_groups]
+    if creations:
+        jobs.append((create, list(creations.values())))
 
-    return
\ No newline at end of file
+    try:
+        if jobs:
+            workers = min(max_concurrency or client.max_concurrency, len(jobs))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(job, calls) for job, calls in jobs]:
+                    future.result()
+    finally:
+        if jobs:
+            invalidate_context_snapshot(client.cloud_id)
+
+    return {
+        "results": results,
+        "calls": sum(len(calls) for calls in merged_groups) + (len(creations) + client.bulk_size - 1) // client.bulk_size,
+        "succeeded": sum(result["ok"] for result in results),
+        "failed": sum(not result["ok"] for result in results),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def sync_jira(rds: RdsManager, client: JiraClient, issue_type: str, full: bool = False):
+    """
+    Sync the user's Jira issues of a given type into their schema (see RdsManager.ensure_user_schema).
+
+    Only issues updated since the last sync (the stored watermark) are fetched and upserted.
+    Pass full=True to refetch everything and rebuild the table.
+    """
+    # Always the whole issue type: the watermark is kept per issue type, so a narrower query
+    # would move it past updates it never fetched
+    jql = f'issuetype = "{issue_type.capitalize()}"'
+
+    watermark = None if full else rds.get_jira_watermark(issue_type)
+    if watermark:
+        # JQL only has minute precision, so re-fetch the watermark's minute; upserts make this idempotent
+        jql = f'({jql}) AND updated >= "{watermark:%Y-%m-%d %H:%M}"'
+
+    # Stream pages straight into the batched upsert instead of materialising every issue
+    issues = client.iter_issues(
+        f"{jql} ORDER BY updated ASC",
+        fields=["summary", "description", "status", "created", "updated", "duedate"]
+    )
+    return rds.sync_jira({"issues": issues}, issue_type, full=full)
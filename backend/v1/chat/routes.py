@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify
-from backend.v1.chat.service import process_chat
+from flask import Blueprint, Response, request, jsonify
+from backend.v1.chat.service import process_chat, stream_chat
 from backend.v1.auth import google_auth_required
 from utils.gmail import address_from_creds
+import json
 
 bp = Blueprint('chat', __name__, url_prefix='/chat')
 
@@ -32,4 +33,44 @@ def chat():
 
         return jsonify({"response": response_message}), 200
     except Exception as e:
-        return jsonify({"response": str(e)}), 500
\ No newline at end of file
+        return jsonify({"response": str(e)}), 500
+
+@bp.route('/stream', methods=['POST'])
+@google_auth_required
+def chat_stream():
+    """
+    Same as /chat, but answers with Server-Sent Events as the agent works:
+    - start: sent immediately
+    - tool_call / tool_result: the agent used a tool (e.g. the SQL it executed and what it returned)
+    - token: a piece of the final answer
+    - done: the full response, including any visualization
+    - error: the chat failed
+
+    Expected Payload:
+    - message: str with the user's message
+    - google-auth-token: dict with user's google auth token
+    """
+    data = request.get_json()
+
+    # Checked before streaming: once the response starts, errors can only be reported as events
+    user_message = data.get('message')
+    if not isinstance(user_message, str) or not user_message.strip():
+        return jsonify({"response": "message must be a non-empty string"}), 400
+    user_message = user_message.strip()
+
+    token = data.get('google-auth-token')
+    try:
+        user_email = address_from_creds(token)
+    except Exception as e:
+        return jsonify({"response": str(e)}), 500
+
+    def events():
+        for event, payload in stream_chat(user_message, user_email):
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
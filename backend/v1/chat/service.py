@@ -1,12 +1,24 @@
-from backend.v1.llm import ChatArctic
+from backend.v1.llm import get_chat_agent, AgentEventHandler
 from backend.v1.database import RdsManager
 from dotenv import load_dotenv
+import threading
+import queue
 import os
 import regex as re
 import base64
 
 load_dotenv()
 
+def _attach_visualization(response: str) -> str:
+    """Embed the generated visualization (if the agent made one) in place of <viz>."""
+    if "<viz>" in response:
+        with open("visualization.png", "rb") as f:
+            viz = base64.b64encode(f.read()).decode("utf-8")
+        os.remove("visualization.png") # Remove the file after reading it
+        response = re.sub(r"<viz>", f"""<viz encoding={viz}>""", response)
+
+    return response
+
 def process_chat(user_message: str, user_email: str) -> str:
     print("domain", os.getenv("DB_HOST"))
     with RdsManager(
@@ -15,21 +27,49 @@ def process_chat(user_message: str, user_email: str) -> str:
         os.getenv("DB_USER"),
         os.getenv("DB_PASSWORD")
     ) as rds:
-        rds.create_user_schema(user_email)
-        rds.switch_user_schema(user_email)
-        rds.create_metadata_table()
+        rds.ensure_user_schema(user_email)
         metadata = rds.get_metadata()
         print("-service.py Metadata: ", metadata)
-        model = ChatArctic(rds=rds)
-        response = model.invoke(user_message)
+        model = get_chat_agent()
+        response = model.invoke(user_message, rds=rds)
 
         print("Model response: ", response)
 
-        # if <viz> in response
-        if "<viz>" in response:
-            with open("visualization.png", "rb") as f:
-                viz = base64.b64encode(f.read()).decode("utf-8")
-            os.remove("visualization.png") # Remove the file after reading it
-            response = re.sub(r"<viz>", f"""<viz encoding={viz}>""", response)
+        return _attach_visualization(response)
+
+def stream_chat(user_message: str, user_email: str):
+    """
+    Same as process_chat, but yields (event, data) pairs while the agent works:
+    "start" right away, then "tool_call", "tool_result" and "token" events (see AgentEventHandler),
+    and finally "done" with the full response, or "error".
+    """
+    events = queue.Queue()
+
+    def emit(event, data):
+        events.put((event, data))
+
+    def run():
+        try:
+            with RdsManager(
+                os.getenv("DB_HOST"),
+                os.getenv("DB_PORT"),
+                os.getenv("DB_USER"),
+                os.getenv("DB_PASSWORD")
+            ) as rds:
+                rds.ensure_user_schema(user_email)
+                response = get_chat_agent().invoke(user_message, rds=rds, callbacks=[AgentEventHandler(emit)])
+            emit("done", {"response": _attach_visualization(response)})
+        except Exception as e:
+            emit("error", {"response": str(e)})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="chat-stream", daemon=True).start()
 
-        return response
\ No newline at end of file
+    # Let the client know we are on it before the agent produces anything
+    yield "start", {}
+    while True:
+        item = events.get()
+        if item is None:
+            return
+        yield item
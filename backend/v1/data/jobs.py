@@ -0,0 +1,376 @@
+"""
+Background ingestion jobs.
+
+POST /v1/data enqueues the email and returns a job id right away. A pool of worker threads runs
+ingest_data and records the outcome, which clients poll through GET /v1/data/jobs/<job_id>.
+
+Backends (JOB_BACKEND):
+- memory (default): an in-process queue. Jobs are lost on restart.
+- redis: jobs live in Redis at REDIS_URL, survive restarts and can also be consumed by
+  standalone workers started with `python -m backend.v1.data.jobs`. A job being worked on sits in
+  a processing list under a lease the worker keeps renewing; if the worker dies, the lease expires
+  and the job is queued again. Retries wait in a sorted set until they are due.
+
+Settings:
+- INGEST_WORKERS: worker threads started in the Flask process (default 4, 0 to rely on standalone workers)
+- INGEST_MAX_RETRIES: retries for transient failures such as a lost DB connection (default 3)
+- JOB_RESULT_TTL: seconds a finished job is kept in Redis (default 86400)
+- JOB_LEASE_SECONDS: seconds without a heartbeat after which a running job is requeued (default 300)
+
+Jobs that fail permanently, or keep failing after their retries, are added to the dead-letter list.
+"""
+
+from backend.v1.data.service import ingest_data
+from dotenv import load_dotenv
+import requests
+import psycopg
+import httpx
+import threading
+import datetime
+import queue
+import uuid
+import json
+import time
+import os
+
+load_dotenv()
+
+# Failures worth retrying; anything else (bad SQL, unparsable LLM output, ...) fails the job right away.
+# Replicate talks httpx and Jira requests, and neither's network errors subclass the builtin ones.
+_TRANSIENT_ERRORS = (
+    psycopg.OperationalError,
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout
+)
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class InMemoryJobBackend:
+    """Keeps jobs in this process. Good for development and tests."""
+
+    # Jobs die with the process anyway, so there is nothing to reclaim
+    lease_seconds = None
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._dead = []
+        self._lock = threading.Lock()
+
+    def save(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def enqueue(self, job_id: str):
+        self._queue.put(job_id)
+
+    def pop(self, timeout: float) -> str:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def ack(self, job_id: str):
+        pass
+
+    def renew(self, job_ids: list):
+        pass
+
+    def retry(self, job_id: str, delay: float):
+        timer = threading.Timer(delay, self.enqueue, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+    def dead_letter(self, job_id: str):
+        with self._lock:
+            self._dead.append(job_id)
+
+    def dead_letters(self) -> list:
+        with self._lock:
+            return list(self._dead)
+
+
+class RedisJobBackend:
+    """
+    Keeps jobs in Redis so they can be shared across processes.
+
+    Keys (under the prefix):
+    - queue: ids of the jobs waiting for a worker
+    - processing: ids of the jobs taken by a worker, until it acknowledges them
+    - leases: per processing job, the time after which it is considered abandoned
+    - delayed: ids of the jobs waiting to be retried, scored by when they are due
+    """
+
+    # Moves the due retries to the queue
+    _PROMOTE = """
+        local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+        for _, job_id in ipairs(due) do
+            redis.call('ZREM', KEYS[1], job_id)
+            redis.call('RPUSH', KEYS[2], job_id)
+        end
+        return #due
+    """
+    # Moves the processing jobs whose lease expired back to the queue. A job without a lease was
+    # just taken (or its worker died before leasing it): it gets one, so it is reclaimed if nobody renews it.
+    _RECLAIM = """
+        local reclaimed = 0
+        for _, job_id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+            local lease = redis.call('HGET', KEYS[2], job_id)
+            if not lease then
+                redis.call('HSET', KEYS[2], job_id, ARGV[2])
+            elseif tonumber(lease) < tonumber(ARGV[1]) then
+                redis.call('LREM', KEYS[1], 1, job_id)
+                redis.call('HDEL', KEYS[2], job_id)
+                redis.call('RPUSH', KEYS[3], job_id)
+                reclaimed = reclaimed + 1
+            end
+        end
+        return reclaimed
+    """
+
+    def __init__(self, url: str, prefix: str = "nirvana:jobs:"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.result_ttl = int(os.getenv("JOB_RESULT_TTL", 86400))
+        self.lease_seconds = int(os.getenv("JOB_LEASE_SECONDS", 300))
+        self._promote = self.redis.register_script(self._PROMOTE)
+        self._reclaim = self.redis.register_script(self._RECLAIM)
+
+    def save(self, job: dict):
+        self.redis.set(f"{self.prefix}job:{job['id']}", json.dumps(job), ex=self.result_ttl)
+
+    def get(self, job_id: str) -> dict:
+        raw = self.redis.get(f"{self.prefix}job:{job_id}")
+        return json.loads(raw) if raw else None
+
+    def enqueue(self, job_id: str):
+        self.redis.rpush(f"{self.prefix}queue", job_id)
+
+    def pop(self, timeout: float) -> str:
+        now = time.time()
+        self._promote(keys=[f"{self.prefix}delayed", f"{self.prefix}queue"], args=[now])
+        reclaimed = self._reclaim(
+            keys=[f"{self.prefix}processing", f"{self.prefix}leases", f"{self.prefix}queue"],
+            args=[now, now + self.lease_seconds]
+        )
+        if reclaimed:
+            print(f"Requeued {reclaimed} abandoned jobs")
+
+        # Atomically taken from the queue into the processing list, so a job is never only in our memory
+        job_id = self.redis.blmove(f"{self.prefix}queue", f"{self.prefix}processing", max(1, int(timeout)), "LEFT", "RIGHT")
+        if job_id is None:
+            return None
+        job_id = job_id.decode()
+        self.redis.hset(f"{self.prefix}leases", job_id, time.time() + self.lease_seconds)
+        return job_id
+
+    def _release(self, pipeline, job_id: str):
+        pipeline.lrem(f"{self.prefix}processing", 1, job_id)
+        pipeline.hdel(f"{self.prefix}leases", job_id)
+
+    def ack(self, job_id: str):
+        """The job is done with (whatever its outcome): it is no longer reclaimed."""
+        with self.redis.pipeline() as pipeline:
+            self._release(pipeline, job_id)
+            pipeline.execute()
+
+    def renew(self, job_ids: list):
+        if job_ids:
+            self.redis.hset(f"{self.prefix}leases", mapping={job_id: time.time() + self.lease_seconds for job_id in job_ids})
+
+    def retry(self, job_id: str, delay: float):
+        with self.redis.pipeline() as pipeline:
+            pipeline.zadd(f"{self.prefix}delayed", {job_id: time.time() + delay})
+            self._release(pipeline, job_id)
+            pipeline.execute()
+
+    def dead_letter(self, job_id: str):
+        self.redis.rpush(f"{self.prefix}dead", job_id)
+
+    def dead_letters(self) -> list:
+        return [job_id.decode() for job_id in self.redis.lrange(f"{self.prefix}dead", 0, -1)]
+
+
+class JobQueue:
+    """
+    A queue of named jobs consumed by a pool of worker threads.
+
+    Example:
+
+        .. code-block:: python
+
+            jobs = JobQueue(InMemoryJobBackend(), {"ingest": lambda payload: ...})
+            jobs.start()
+            job_id = jobs.submit("ingest", {"email": "...", "user_email": "..."})
+            jobs.get(job_id)["status"]  # queued -> running -> succeeded / failed
+    """
+
+    def __init__(self, backend, handlers: dict, workers: int = 4, max_retries: int = 3):
+        self.backend = backend
+        self.handlers = handlers
+        self.workers = workers
+        self.max_retries = max_retries
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        # Ids of the jobs this process is running, whose leases the heartbeat renews
+        self._running = set()
+
+    def submit(self, kind: str, payload: dict, owner: str = None) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "owner": owner,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "updated_at": _now()
+        }
+        self.backend.save(job)
+        self.backend.enqueue(job["id"])
+        return job["id"]
+
+    def get(self, job_id: str) -> dict:
+        return self.backend.get(job_id)
+
+    def dead_letters(self) -> list:
+        return self.backend.dead_letters()
+
+    def start(self):
+        """Start the worker threads (once)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.backend.lease_seconds:
+                thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"Started {self.workers} job workers.")
+
+    def stop(self):
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+
+    def _update(self, job: dict, **fields):
+        job.update(fields, updated_at=_now())
+        self.backend.save(job)
+
+    def _heartbeat(self):
+        # Renew well before the leases expire, so only the jobs of a dead process get reclaimed
+        while not self._stopping.wait(self.backend.lease_seconds / 3):
+            with self._lock:
+                running = list(self._running)
+            try:
+                self.backend.renew(running)
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job_id = self.backend.pop(timeout=1)
+            if job_id is None:
+                continue
+
+            job = self.backend.get(job_id)
+            if job is None:
+                # Expired or unknown: nothing to run
+                self.backend.ack(job_id)
+                continue
+
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _run(self, job: dict):
+        self._update(job, status="running", attempts=job["attempts"] + 1)
+        try:
+            result = self.handlers[job["kind"]](job["payload"])
+        except _TRANSIENT_ERRORS as e:
+            if job["attempts"] <= self.max_retries:
+                delay = min(2 ** job["attempts"], 30)
+                print(f"Job {job['id']} failed with a transient error ({e}), retrying in {delay}s")
+                self._update(job, status="retrying", error=str(e))
+                self.backend.retry(job["id"], delay)
+            else:
+                self._fail(job, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self._update(job, status="succeeded", result=result, error=None)
+            self.backend.ack(job["id"])
+
+    def _fail(self, job: dict, error: Exception):
+        print(f"Job {job['id']} failed: {error}")
+        self._update(job, status="failed", error=str(error))
+        self.backend.dead_letter(job["id"])
+        self.backend.ack(job["id"])
+
+
+def _ingest(payload: dict):
+    return ingest_data(payload["email"], payload["user_email"])
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(start_workers: bool = True) -> JobQueue:
+    """Return the process-wide job queue, starting its workers on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            if os.getenv("JOB_BACKEND", "memory") == "redis":
+                backend = RedisJobBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+            else:
+                backend = InMemoryJobBackend()
+
+            _job_queue = JobQueue(
+                backend,
+                {"ingest": _ingest},
+                workers=int(os.getenv("INGEST_WORKERS", 4)),
+                max_retries=int(os.getenv("INGEST_MAX_RETRIES", 3))
+            )
+
+    if start_workers and _job_queue.workers > 0:
+        _job_queue.start()
+    return _job_queue
+
+
+# Standalone worker for the redis backend
+if __name__ == "__main__":
+    jobs = get_job_queue(start_workers=False)
+    jobs.workers = jobs.workers or 1
+    jobs.start()
+    while True:
+        time.sleep(60)
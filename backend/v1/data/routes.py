@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from backend.v1.data.service import ingest_data
+from backend.v1.data.service import ingest_batch
+from backend.v1.data.jobs import get_job_queue
 from backend.v1.auth import google_auth_required
 from utils.gmail import address_from_creds
 
@@ -11,6 +12,8 @@ def ingest():
     """
     Given an email, remember useful information about the user for future insights.
 
+    Ingestion runs in the background: the response carries a job id to poll at /v1/data/jobs/<job_id>.
+
     Expected Payload:
     - email: str with the user's email we are ingesting data for
     - google-auth-token: dict with user's google auth token
@@ -21,9 +24,67 @@ def ingest():
     token = data.get('google-auth-token')
     user_email = address_from_creds(token)
 
-    # Process the chat message
+    # Queue the email for the ingestion workers
     try: 
-        ingest_data(email, user_email)
-        return jsonify({'response': 'Data ingested successfully'}), 200
+        job_id = get_job_queue().submit("ingest", {"email": email, "user_email": user_email}, owner=user_email)
+        return jsonify({'response': 'Data ingestion queued', 'job_id': job_id}), 202
+    except Exception as e:
+        return jsonify({'response': f'Data ingestion failed due to the following exception: {e}'}), 500
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@google_auth_required
+def job_status(job_id):
+    """
+    Poll the status of an ingestion job.
+
+    Expected Payload:
+    - google-auth-token: dict with user's google auth token
+
+    Returns the job's status (queued, running, retrying, succeeded or failed), attempts, result and error.
+    """
+    data = request.get_json()
+    token = data.get('google-auth-token')
+    user_email = address_from_creds(token)
+
+    job = get_job_queue().get(job_id)
+    if job is None or job['owner'] != user_email:
+        return jsonify({'response': f'No job with id {job_id}'}), 404
+
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'result': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }), 200
+
+@bp.route('/batch', methods=['POST'])
+@google_auth_required
+def ingest_many():
+    """
+    Given a list of emails, remember useful information about the user from all of them.
+
+    Expected Payload:
+    - emails: list of str with the emails we are ingesting data for
+    - google-auth-token: dict with user's google auth token
+    """
+    data = request.get_json()
+    emails = data.get('emails')
+    if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+        return jsonify({'response': 'emails must be a list of strings'}), 400
+
+    token = data.get('google-auth-token')
+    user_email = address_from_creds(token)
+
+    try:
+        results = ingest_batch(emails, user_email)
     except Exception as e:
-        return jsonify({'response': f'Data ingestion failed due to the following exception: {e}'}), 500
\ No newline at end of file
+        return jsonify({'response': f'Data ingestion failed due to the following exception: {e}'}), 500
+
+    ingested = sum(1 for result in results if result['status'] == 'ingested')
+    return jsonify({
+        'response': f'Ingested {ingested} of {len(emails)} emails',
+        'results': results
+    }), 200
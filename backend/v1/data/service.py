@@ -1,11 +1,39 @@
 from backend.v1.llm import extract_features
-from backend.v1.database import RdsManager
+from backend.v1.database import RdsManager, DEDUP_TTL
+from utils.cache import TTLCache, content_hash
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
 
-def ingest_data(email: str, user_email: str) -> str:
-    """Given an email, extract any features we may want to remember and store them in the database."""
+# Recently ingested emails per (schema, content hash), in front of each schema's processed_emails table
+_processed = TTLCache(maxsize=int(os.getenv("DEDUP_CACHE_SIZE", 10000)), ttl=DEDUP_TTL)
+
+def _find_processed(rds: RdsManager, digest: str):
+    """Return the statements stored for an already ingested email, or None."""
+    key = (rds.schema_name, digest)
+    result = _processed.get(key)
+    if result is None:
+        result = rds.get_processed_email(digest)
+        if result is not None:
+            _processed.set(key, result)
+    return result
+
+def _store(rds: RdsManager, digest: str, features: list):
+    """Apply an email's statements and remember it as processed, atomically."""
+    with rds.transaction():
+        rds.apply_sql(features)
+        rds.record_processed_email(digest, features)
+
+def ingest_data(email: str, user_email: str) -> list:
+    """
+    Given an email, extract any features we may want to remember and store them in the database.
+    Returns the SQL statements that were executed.
+
+    An email whose normalised content was already ingested (within DEDUP_TTL) is skipped,
+    returning the statements stored the first time.
+    """
     load_dotenv()
+    digest = content_hash(email)
 
     with RdsManager(
         os.getenv("DB_HOST"),
@@ -13,12 +41,105 @@ def ingest_data(email: str, user_email: str) -> str:
         os.getenv("DB_USER"),
         os.getenv("DB_PASSWORD")
     ) as rds:
-        rds.switch_user_schema(user_email)
+        rds.ensure_user_schema(user_email)
+
+        processed = _find_processed(rds, digest)
+        if processed is not None:
+            print(f"Email {digest[:12]} already ingested, skipping.")
+            return processed
+
         # Get context
         context = rds.get_metadata()
         print(f"Context: {context}")
         features = extract_features(email, context)['extracted_information']
         print(f"Extracted features: {features}")
-        for feature in features:
-            print(f"Executing SQL: {feature}")
-            rds.execute_sql(feature)
\ No newline at end of file
+        # All or nothing: a failing statement rolls back the whole email
+        _store(rds, digest, features)
+        _processed.set((rds.schema_name, digest), features)
+
+    return features
+
+def _extract(email: str, context: dict) -> tuple:
+    """Run feature extraction for one email, returning (features, error) instead of raising."""
+    try:
+        return extract_features(email, context)['extracted_information'], None
+    except Exception as e:
+        print(f"Error extracting features: {e}")
+        return None, str(e)
+
+def ingest_batch(emails: list, user_email: str) -> list:
+    """
+    Given many emails for the same user, extract and store features for all of them.
+
+    Emails are processed in chunks of INGEST_BATCH_SIZE (default 50) over a single connection.
+    Within a chunk, feature extraction runs concurrently (at most INGEST_CONCURRENCY LLM calls
+    in flight, default 4), then the extracted SQL is applied in one transaction, with each email
+    applied atomically in its own savepoint so a bad email does not roll back the others.
+    Emails already ingested, or repeated earlier in the batch, are reported as duplicates.
+
+    Returns one status dict per email, in input order.
+    """
+    load_dotenv()
+    batch_size = int(os.getenv("INGEST_BATCH_SIZE", 50))
+    concurrency = int(os.getenv("INGEST_CONCURRENCY", 4))
+    results = []
+    seen = {}
+
+    with RdsManager(
+        os.getenv("DB_HOST"),
+        os.getenv("DB_PORT"),
+        os.getenv("DB_USER"),
+        os.getenv("DB_PASSWORD")
+    ) as rds:
+        rds.ensure_user_schema(user_email)
+
+        for start in range(0, len(emails), batch_size):
+            batch = emails[start:start + batch_size]
+
+            # Sort out duplicates before paying for any LLM call
+            pending = []
+            for index, email in enumerate(batch, start=start):
+                digest = content_hash(email)
+                if digest in seen:
+                    results.append({"index": index, "status": "duplicate", "duplicate_of": seen[digest]})
+                    continue
+                seen[digest] = index
+
+                processed = _find_processed(rds, digest)
+                if processed is not None:
+                    results.append({"index": index, "status": "duplicate", "statements": len(processed)})
+                    continue
+
+                results.append(None)
+                pending.append((index, digest, email))
+
+            if not pending:
+                continue
+
+            # Re-read per chunk so emails see tables created by the previous chunk
+            context = rds.get_metadata()
+
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(pending))) as executor:
+                extracted = list(executor.map(lambda item: _extract(item[2], context), pending))
+
+            stored = []
+            with rds.transaction():
+                for (index, digest, _), (features, error) in zip(pending, extracted):
+                    if error is not None:
+                        results[index] = {"index": index, "status": "failed", "error": error}
+                        continue
+
+                    try:
+                        _store(rds, digest, features)
+                        stored.append((digest, features))
+                        results[index] = {"index": index, "status": "ingested", "statements": len(features)}
+                    except Exception as e:
+                        results[index] = {"index": index, "status": "failed", "error": str(e)}
+
+            # Only cache once the chunk is committed
+            for digest, features in stored:
+                _processed.set((rds.schema_name, digest), features)
+
+            print(f"Ingested emails {start}-{start + len(batch) - 1} of {len(emails)}")
+
+    return results
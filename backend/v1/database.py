@@ -1,6 +1,169 @@
-import psycopg
+from contextlib import contextmanager
+from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool
+from utils.cache import TTLCache
+from utils.embeddings import IndexWriter, get_index, issue_text
+import threading
 import json
+import os
 import re
+import time
+
+"""
+Connection pooling.
+
+Every request used to open (and close) its own connection, paying for the TCP, TLS and
+auth handshake each time. Instead, we keep one pool per (host, port, user) for the whole
+process and RdsManager checks a warm connection out of it for the duration of the `with` block.
+When the password changes (e.g. after a credential rotation) the pool is replaced by a new one.
+
+Pool sizing can be tuned through the environment:
+- DB_POOL_MIN_SIZE: connections kept open at all times (default 2)
+- DB_POOL_MAX_SIZE: hard cap on open connections (default 10)
+- DB_POOL_MAX_IDLE: seconds before an idle connection above min size is closed (default 300)
+- DB_POOL_TIMEOUT: seconds to wait for a free connection before giving up (default 30)
+"""
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _configure_connection(conn):
+    """Run once on every new connection the pool opens."""
+    conn.autocommit = True
+
+
+def _reset_connection(conn):
+    """Run every time a connection is returned, so the next checkout starts from the default schema."""
+    conn.execute("RESET search_path")
+
+
+def get_pool(host, port, user, password) -> ConnectionPool:
+    """Return the process-wide pool for the given server, creating it on first use."""
+    key = (host, str(port), user)
+    stale = None
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.kwargs.get("password") != password:
+            # Its connections would keep using the old credentials
+            stale, pool = pool, None
+        if pool is None:
+            pool = ConnectionPool(
+                kwargs={
+                    "host": host,
+                    "port": port,
+                    "user": user,
+                    "password": password
+                },
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                configure=_configure_connection,
+                reset=_reset_connection,
+                check=ConnectionPool.check_connection,
+                name=f"rds-{host}",
+                open=True
+            )
+            _pools[key] = pool
+            print(f"Connection pool '{pool.name}' opened.")
+
+    if stale is not None:
+        # Connections still checked out are closed when they are returned
+        stale.close()
+        print(f"Connection pool '{stale.name}' closed: the password changed.")
+    return pool
+
+
+def pool_stats() -> dict:
+    """
+    Wait-time and saturation stats for every open pool, keyed by pool name.
+
+    saturation is the share of max_size currently checked out (1.0 means requests are queueing).
+    """
+    stats = {}
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        raw = pool.get_stats()
+        in_use = raw.get("pool_size", 0) - raw.get("pool_available", 0)
+        requests_num = raw.get("requests_num", 0)
+        stats[pool.name] = {
+            "min_size": pool.min_size,
+            "max_size": pool.max_size,
+            "size": raw.get("pool_size", 0),
+            "available": raw.get("pool_available", 0),
+            "in_use": in_use,
+            "waiting": raw.get("requests_waiting", 0),
+            "saturation": in_use / pool.max_size if pool.max_size else 0.0,
+            "requests": requests_num,
+            "requests_queued": raw.get("requests_queued", 0),
+            "requests_errors": raw.get("requests_errors", 0),
+            "wait_ms_total": raw.get("requests_wait_ms", 0),
+            "wait_ms_avg": raw.get("requests_wait_ms", 0) / requests_num if requests_num else 0.0,
+            "connections_lost": raw.get("connections_lost", 0)
+        }
+    return stats
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+"""
+Metadata cache.
+
+get_metadata() is read at least twice per chat turn, so we keep a per-schema copy of the
+metadata table in process. Entries are dropped whenever this process changes the metadata
+table, and otherwise expire after METADATA_CACHE_TTL seconds (default 300) so changes made
+by other workers are eventually picked up. At most METADATA_CACHE_SIZE schemas are kept (default 256).
+"""
+
+metadata_cache = TTLCache(
+    maxsize=int(os.getenv("METADATA_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("METADATA_CACHE_TTL", 300))
+)
+
+"""
+Schema bootstrap.
+
+A user schema (and its metadata table) only needs to be created once. ensure_user_schema()
+runs the DDL the first time this process sees a schema and remembers it, so steady-state
+requests only pay for the SET search_path.
+"""
+
+_provisioned_schemas = set()
+_provisioned_lock = threading.Lock()
+
+# How long a processed email is remembered for deduplication, in seconds (default 7 days)
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", 7 * 86400))
+
+# Regex to match "CREATE TABLE" with or without "IF NOT EXISTS"
+# Used with .match: only statements that start with CREATE/DROP TABLE count, not ones that mention it
+# (e.g. an INSERT of the text "drop table customers")
+_CREATE_TABLE = re.compile(r"\s*CREATE TABLE(\s+IF NOT EXISTS)?\s+(\w+)\s*\((.+)\)", re.IGNORECASE | re.DOTALL)
+_DROP_TABLE = re.compile(r"\s*DROP TABLE\s+(IF EXISTS\s+)?(\w+)\b", re.IGNORECASE)
+
+_UPSERT_METADATA = """
+INSERT INTO metadata (table_name, table_columns)
+VALUES (%s, %s)
+ON CONFLICT (table_name) DO UPDATE SET
+    table_columns = EXCLUDED.table_columns;
+"""
+
+
+def _table_columns(match_create) -> list:
+    """Column names declared in a matched CREATE TABLE statement."""
+    columns = []
+    for column_detail in match_create.group(3).split(','):
+        first_word = column_detail.strip().split()[0]
+        columns.append(first_word)
+    return columns
+
 
 class RdsManager():
     def __init__(self, host, port, user, password):
@@ -8,20 +171,19 @@ class RdsManager():
         self.port = port
         self.user = user
         self.password = password
+        self.pool = None
         self.conn = None
         self.cursor = None
+        self.schema_name = None
+        # Nesting of self.transaction(), and whether the metadata cache must be dropped once it commits
+        self._transaction_depth = 0
+        self._metadata_stale = False
 
     def __enter__(self):
         try:
-            # Connect to the PostgreSQL server
-            self.conn = psycopg.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password
-            )
-            self.conn.autocommit = True
-            print("Connection established.")
+            # Check a warm connection out of the shared pool
+            self.pool = get_pool(self.host, self.port, self.user, self.password)
+            self.conn = self.pool.getconn()
 
             # Create a cursor object
             self.cursor = self.conn.cursor()
@@ -30,6 +192,9 @@ class RdsManager():
 
         except Exception as e:
             print(f"Error encountered {e}")
+            if self.conn:
+                self.pool.putconn(self.conn)
+                self.conn = None
             raise
 
     def create_user_schema(self, user_email):
@@ -37,9 +202,27 @@ class RdsManager():
         self.cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema_name}")
         print(f"Schema '{schema_name}' created (if not exists).")
 
+    def ensure_user_schema(self, user_email):
+        """Provision the user's schema on first use in this process, then switch to it."""
+        schema_name = self.get_schema_name(user_email)
+        key = (self.host, schema_name)
+
+        if key in _provisioned_schemas:
+            self.switch_user_schema(user_email)
+            return
+
+        self.create_user_schema(user_email)
+        self.switch_user_schema(user_email)
+        self.create_metadata_table()
+        self.create_processed_emails_table()
+        self.create_sync_state_table()
+        with _provisioned_lock:
+            _provisioned_schemas.add(key)
+
     def switch_user_schema(self, user_email):
         schema_name = self.get_schema_name(user_email)
         self.cursor.execute(f"SET search_path TO {schema_name}")
+        self.schema_name = schema_name
         print(f"Switched to schema '{schema_name}'.")
 
     # Generate a valid schema name based on the user's email
@@ -55,7 +238,7 @@ class RdsManager():
         """)
         return self.cursor.fetchall()
 
-    def execute_core_sql(self, sql, values=None):
+    def execute_core_sql(self, sql, values=None, raise_errors=False):
         # Check if values are in the correct format (tuple or list), adjust if it's a dictionary
         if isinstance(values, dict):
             # Assume the keys of the dictionary match the placeholders order
@@ -63,85 +246,261 @@ class RdsManager():
             
         try:
             self.cursor.execute(sql, values)
-            return self.cursor.fetchall() 
+            # Only statements that return rows (SELECT, ... RETURNING) have a description
+            if self.cursor.description is not None:
+                return self.cursor.fetchall()
         except Exception as e:
             print(f"Error executing SQL: {str(e)}")
+            if raise_errors:
+                raise
 
 
-    def execute_sql(self, sql, values=None):
-        self.create_metadata_table()
-
-        # Regex to match "CREATE TABLE" with or without "IF NOT EXISTS"
-        match_create_pattern = r"CREATE TABLE(\s+IF NOT EXISTS)?\s+(\w+)\s+\((.+)\)"
-        match_drop_pattern = r"DROP TABLE\s+(IF EXISTS\s+)?(\w+);"
-        match_create = re.search(match_create_pattern, sql, re.IGNORECASE)
-        match_drop = re.search(match_drop_pattern, sql, re.IGNORECASE)
+    def execute_sql(self, sql, values=None, raise_errors=False):
+        match_create = _CREATE_TABLE.match(sql)
+        match_drop = _DROP_TABLE.match(sql)
 
 
         if match_create:
             # Execute the SQL without introspection to avoid recursion
-            self.execute_core_sql(sql, values)
+            self.execute_core_sql(sql, values, raise_errors=raise_errors)
             
             table_name = match_create.group(2)
-            columns_part = match_create.group(3)
-            
-            columns = []
-            for column_detail in columns_part.split(','):
-                first_word = column_detail.strip().split()[0]
-                columns.append(first_word)
+            columns = _table_columns(match_create)
             
             # Update metadata with newfound table info
-            self.update_metadata(table_name, columns)
+            self.update_metadata(table_name, columns, raise_errors=raise_errors)
         elif match_drop: 
-            self.execute_core_sql(sql, values)
+            self.execute_core_sql(sql, values, raise_errors=raise_errors)
             table_name = match_drop.group(2)
 
-            self.delete_metadata(table_name)
+            self.delete_metadata(table_name, raise_errors=raise_errors)
         else:
             # If not a CREATE TABLE statement, just execute the SQL
-            self.execute_core_sql(sql, values)
+            self.execute_core_sql(sql, values, raise_errors=raise_errors)
 
 
 
-    def delete_metadata(self, table_name):
+    @contextmanager
+    def transaction(self):
+        """
+        Same as conn.transaction() (nested calls become savepoints), but the metadata cache is only
+        dropped once the outermost transaction has ended. Dropping it earlier would let a concurrent
+        request re-cache the pre-commit metadata for METADATA_CACHE_TTL.
+        """
+        self._transaction_depth += 1
+        try:
+            with self.conn.transaction():
+                yield
+        finally:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0 and self._metadata_stale:
+                self._metadata_stale = False
+                self.invalidate_metadata()
+
+    def apply_sql(self, statements):
+        """
+        Run a list of statements (e.g. everything extracted from one email) atomically.
+
+        CREATE/DROP TABLE statements run on their own; runs of other statements are sent as a
+        single multi-statement round-trip. The metadata table is updated once at the end.
+        If anything fails, the whole list is rolled back and the error is raised.
+        """
+        created = {}
+        dropped = set()
+        pending = []
+
+        def flush():
+            if pending:
+                self.cursor.execute(";\n".join(pending))
+                pending.clear()
+
+        with self.transaction():
+            for sql in statements:
+                sql = sql.strip().rstrip(";")
+                if not sql:
+                    continue
+
+                match_create = _CREATE_TABLE.match(sql)
+                match_drop = _DROP_TABLE.match(sql)
+                if match_create:
+                    flush()
+                    self.cursor.execute(sql)
+                    table_name = match_create.group(2)
+                    created[table_name] = _table_columns(match_create)
+                    dropped.discard(table_name)
+                elif match_drop:
+                    flush()
+                    self.cursor.execute(sql)
+                    table_name = match_drop.group(2)
+                    dropped.add(table_name)
+                    created.pop(table_name, None)
+                else:
+                    pending.append(sql)
+            flush()
+
+            if created:
+                self.cursor.executemany(_UPSERT_METADATA, list(created.items()))
+            if dropped:
+                self.cursor.execute("DELETE FROM metadata WHERE table_name = ANY(%s)", (list(dropped),))
+
+        if created or dropped:
+            self.invalidate_metadata()
+
+        return {
+            "statements": len(statements),
+            "created": list(created),
+            "dropped": sorted(dropped)
+        }
+
+    def delete_metadata(self, table_name, raise_errors=False):
         delete_sql = "DELETE FROM metadata WHERE table_name = %s;"
-        self.execute_core_sql(delete_sql, (table_name,))
+        self.execute_core_sql(delete_sql, (table_name,), raise_errors=raise_errors)
+        self.invalidate_metadata()
 
-    def sync_jira(self, issues, issue_type):
+    def sync_jira(self, issues, issue_type, batch_size=None, full=False):
+        """
+        Upsert Jira issues into the table for the given issue type (e.g. "task" -> Tasks).
+
+        Rows are sent with executemany in batches of `batch_size` (JIRA_SYNC_BATCH_SIZE, default 500),
+        which psycopg pipelines into a single round-trip per batch, all inside one transaction.
+        By default only the given issues are upserted; pass full=True to rebuild the table from
+        scratch. Either way the issue type's watermark is moved to the newest UpdatedDate stored.
+        Each batch is also embedded as it is flushed, and the vectors are written to the schema's
+        issue index once the transaction commits (see utils.embeddings).
+        Returns the number of rows written and the throughput.
+        """
         # Determine the table name based on the issue type
         table_name = issue_type.capitalize() + 's'  
-        issues = json.loads(issues)
-
-        # Initialize Issue tables
-        self.create_tables(table_name)
-
-        for issue in issues['issues']:
-            issue_id = issue['id']
-            project_key = issue['fields']['project']['key']
-            issue_key = issue['key']
-            summary = issue['fields']['summary']
-            description = issue['fields']['description']
-            status = issue['fields']['status']['name']
-            created_date = issue['fields']['created']
-            updated_date = issue['fields']['updated']
-            due_date = issue['fields']['duedate']
-
-            # Insert the issue data into the corresponding SQL table
-            sql = f"""
-            INSERT INTO {table_name} (IssueID, Summary, Description, Status, CreatedDate, UpdatedDate, DueDate)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (IssueID) DO UPDATE SET
-                Summary = EXCLUDED.Summary,
-                Description = EXCLUDED.Description,
-                Status = EXCLUDED.Status,
-                CreatedDate = EXCLUDED.CreatedDate,
-                UpdatedDate = EXCLUDED.UpdatedDate,
-                DueDate = EXCLUDED.DueDate;
-            """
-            values = (issue_id, summary, description, status, created_date, updated_date, due_date)
-            self.execute_core_sql(sql, values)
-
-    def create_tables(self, table_name):
+        if isinstance(issues, str):
+            issues = json.loads(issues)
+        batch_size = batch_size or int(os.getenv("JIRA_SYNC_BATCH_SIZE", 500))
+
+        sql = f"""
+        INSERT INTO {table_name} (IssueID, Summary, Description, Status, CreatedDate, UpdatedDate, DueDate)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (IssueID) DO UPDATE SET
+            Summary = EXCLUDED.Summary,
+            Description = EXCLUDED.Description,
+            Status = EXCLUDED.Status,
+            CreatedDate = EXCLUDED.CreatedDate,
+            UpdatedDate = EXCLUDED.UpdatedDate,
+            DueDate = EXCLUDED.DueDate;
+        """
+
+        start = time.perf_counter()
+        rows = 0
+        writer = self._index_writer(table_name, replace=full)
+        with self.transaction():
+            # Initialize Issue tables
+            self.create_tables(table_name, full=full)
+
+            batch = []
+            for issue in issues['issues']:
+                batch.append(self._issue_row(issue))
+                if len(batch) >= batch_size:
+                    self.cursor.executemany(sql, batch)
+                    rows += len(batch)
+                    writer = self._embed_rows(writer, table_name, batch)
+                    batch = []
+            if batch:
+                self.cursor.executemany(sql, batch)
+                rows += len(batch)
+                writer = self._embed_rows(writer, table_name, batch)
+
+            self.set_jira_watermark(issue_type, table_name)
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = rows / elapsed if elapsed else 0.0
+        print(f"Synced {rows} issues into {table_name} in {elapsed:.2f}s ({rows_per_second:.0f} rows/s)")
+
+        if writer is not None:
+            try:
+                writer.commit()
+                print(f"Indexed {len(writer)} issues of {table_name} ({len(writer.index)} in the index)")
+            except Exception as e:
+                print(f"Error indexing issues of {table_name}: {e}")
+
+        return {
+            "table": table_name,
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_second": rows_per_second
+        }
+
+    def _index_writer(self, table_name, replace=False):
+        """An IndexWriter for the schema's index of the table, or None if embeddings are off or unavailable."""
+        try:
+            index = get_index(self.schema_name, table_name)
+        except Exception as e:
+            print(f"Error opening the issue index of {table_name}: {e}")
+            return None
+        return IndexWriter(index, replace=replace) if index is not None else None
+
+    def _embed_rows(self, writer, table_name, rows):
+        """
+        Embed a batch of issue rows into the writer, keeping only their ids and vectors.
+        Indexing never fails a sync: on error the writer is dropped (None) for the rest of it.
+        """
+        if writer is None:
+            return None
+        try:
+            writer.add(
+                [row[0] for row in rows],
+                [issue_text(row[1], row[2]) for row in rows],
+                [row[1] for row in rows]
+            )
+            return writer
+        except Exception as e:
+            print(f"Error embedding issues of {table_name}, skipping the index for this sync: {e}")
+            return None
+
+    def _issue_row(self, issue):
+        """Flatten a Jira issue into the column order used by the issue tables."""
+        fields = issue['fields']
+        description = fields.get('description')
+        if isinstance(description, dict):
+            # API v3 returns descriptions as Atlassian Document Format
+            description = json.dumps(description)
+
+        return (
+            issue['id'],
+            fields['summary'],
+            description,
+            fields['status']['name'],
+            fields['created'],
+            fields['updated'],
+            fields.get('duedate')
+        )
+
+    def create_sync_state_table(self):
+        sql = """CREATE TABLE IF NOT EXISTS jira_sync_state (
+            issue_type VARCHAR(255) PRIMARY KEY,
+            watermark TIMESTAMP
+            );
+        """
+        self.cursor.execute(sql)
+
+    def get_jira_watermark(self, issue_type):
+        """Return the newest UpdatedDate synced for this issue type, or None if it was never synced."""
+        self.cursor.execute(
+            "SELECT watermark FROM jira_sync_state WHERE issue_type = %s",
+            (issue_type.lower(),)
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def set_jira_watermark(self, issue_type, table_name):
+        """Move the issue type's watermark to the newest UpdatedDate in its table."""
+        self.cursor.execute(f"""
+            INSERT INTO jira_sync_state (issue_type, watermark)
+            SELECT %s, MAX(UpdatedDate) FROM {table_name}
+            ON CONFLICT (issue_type) DO UPDATE SET
+                watermark = EXCLUDED.watermark;
+            """,
+            (issue_type.lower(),)
+        )
+
+    def create_tables(self, table_name, full=False):
         create_table = f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             IssueID VARCHAR(255) PRIMARY KEY,
@@ -155,8 +514,9 @@ class RdsManager():
         """
 
         columns = ["IssueID", "Summary", "Description", "Status", "CreatedDate", "UpdatedDate", "DueDate"]
-        # Drop tables first
-        self.execute_core_sql(f"DROP TABLE IF EXISTS {table_name}")
+        # Only a full resync starts from an empty table
+        if full:
+            self.execute_core_sql(f"DROP TABLE IF EXISTS {table_name}")
 
         # Add table information to metadata table  
         self.update_metadata(table_name, columns)
@@ -170,34 +530,85 @@ class RdsManager():
             );
         """
         try:
-            self.execute_core_sql(sql)
+            self.cursor.execute(sql)
         except Exception as e:
             print(f"Error creating metadata table: {e}")
             raise 
 
-    def update_metadata(self, table_name, columns):
-        self.create_metadata_table()
-        update_sql = """
-        INSERT INTO metadata (table_name, table_columns)
-        VALUES (%s, %s)
-        ON CONFLICT (table_name) DO UPDATE SET
-            table_columns = EXCLUDED.table_columns;
-        """
+    def create_processed_emails_table(self):
+        """Index of already ingested emails by content hash, pruned of expired entries."""
+        self.cursor.execute("""CREATE TABLE IF NOT EXISTS processed_emails (
+            content_hash CHAR(64) PRIMARY KEY,
+            result JSONB,
+            processed_at TIMESTAMP NOT NULL DEFAULT now()
+            );
+        """)
+        self.cursor.execute(
+            "DELETE FROM processed_emails WHERE processed_at < now() - make_interval(secs => %s)",
+            (DEDUP_TTL,)
+        )
+
+    def get_processed_email(self, content_hash):
+        """Return the stored result of an email ingested within DEDUP_TTL, or None."""
+        self.cursor.execute("""
+            SELECT result FROM processed_emails
+            WHERE content_hash = %s AND processed_at >= now() - make_interval(secs => %s)
+            """,
+            (content_hash, DEDUP_TTL)
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def record_processed_email(self, content_hash, result):
+        self.cursor.execute("""
+            INSERT INTO processed_emails (content_hash, result)
+            VALUES (%s, %s)
+            ON CONFLICT (content_hash) DO UPDATE SET
+                result = EXCLUDED.result,
+                processed_at = now();
+            """,
+            (content_hash, Jsonb(result))
+        )
+
+    def update_metadata(self, table_name, columns, raise_errors=False):
         # Execute using execute_core_sql to avoid triggering additional checks
-        self.execute_core_sql(update_sql, (table_name, columns))
+        self.execute_core_sql(_UPSERT_METADATA, (table_name, columns), raise_errors=raise_errors)
+        self.invalidate_metadata()
 
     def get_metadata(self):
+        # Inside a transaction we may see uncommitted tables, which must not reach the shared cache
+        use_cache = self.schema_name and self._transaction_depth == 0
+        if use_cache:
+            cached = metadata_cache.get(self.schema_name)
+            if cached is not None:
+                return dict(cached)
+
         fetch_sql = "SELECT table_name, table_columns FROM metadata"
         self.cursor.execute(fetch_sql)
         rows = self.cursor.fetchall()
 
         metadata_dict = {row[0]: row[1] for row in rows}
-        return metadata_dict
+        if use_cache:
+            metadata_cache.set(self.schema_name, metadata_dict)
+        return dict(metadata_dict)
+
+    def invalidate_metadata(self):
+        """
+        Drop the cached metadata of the current schema, forcing the next get_metadata() to hit the database.
+        Inside self.transaction() this is deferred until the outermost transaction ends.
+        """
+        if self._transaction_depth > 0:
+            self._metadata_stale = True
+        elif self.schema_name:
+            metadata_cache.pop(self.schema_name)
 
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.conn:
-            self.conn.close()
-        print("Database connection closed")
+            # Hand the connection back to the pool; it is reset (or discarded if broken) there
+            self.pool.putconn(self.conn)
+            self.conn = None
+        print("Database connection returned to pool")
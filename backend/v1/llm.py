@@ -1,4 +1,6 @@
 from utils.wrappers import Arctic, GPT
+from utils.llm_cache import with_cache
+from utils.embeddings import search_issues
 from pydantic import BaseModel, Field
 
 from langchain_core.output_parsers import StrOutputParser
@@ -7,9 +9,12 @@ from langchain_core.prompts import (
     FewShotPromptTemplate
 )
 from langchain_core.runnables import RunnableLambda
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain.agents import initialize_agent, Tool
 from langchain.chains import LLMMathChain
 from ast import literal_eval
+from functools import lru_cache
+from contextvars import ContextVar
 from backend.v1.database import RdsManager
 import regex as re
 import json
@@ -49,6 +54,19 @@ def dict_to_str(d: list) -> str:
     assert isinstance(d, dict) or isinstance(d, list), f"Input is a {type(d)}."
     return yaml.dump(d, default_flow_style=False)
 
+"""
+Models and chains are built lazily, once per process, and shared by every request.
+"""
+
+@lru_cache(maxsize=None)
+def _arctic() -> Arctic:
+    return with_cache(Arctic())
+
+@lru_cache(maxsize=None)
+def _gpt() -> GPT:
+    # Deterministic, so that generate_actions' responses can be cached (see with_cache)
+    return with_cache(GPT(model='gpt-4o', temperature=0, api_key=os.getenv("OPENAI_API_KEY")))
+
 """
 Chains:
 - Chain for Email in -> Decision about what to do with JIRA out [output: md list that we can parse]
@@ -58,15 +76,9 @@ Chains:
 """
 
 # JIRA Features
-def generate_actions(email: str, context: dict, funcs: list) -> dict:
-    assert isinstance(context, dict), f"Context is a {type(context)}."
-    """
-    Given an email, a set of options of what our backend can do with JIRA,
-    some context related to the user's current JIRA setup (projects, current issues, tasks, etc),
-    and a list of functions we have access to in order to interact with JIRA,
-    we need to make a decision about what to do with the JIRA API, if anything.
-    """
-
+@lru_cache(maxsize=None)
+def _actions_chain():
+    """Prompt and model behind generate_actions, built once per process."""
     prefix = _SYS_PROMPT + """
     You are an assistant working on the JIRA integration module of the Nirvana app.
     Given an email a user has received, a set of options of what our backend can do with JIRA,
@@ -190,15 +202,27 @@ def generate_actions(email: str, context: dict, funcs: list) -> dict:
         prefix=prefix
     )
 
-    context = dict_to_str(context)
-
-    chain = (
+    return (
         prompt
-        | GPT(model='gpt-4o', api_key=os.getenv("OPENAI_API_KEY"))
+        | _gpt()
         | StrOutputParser()
     )
 
-    output = chain.invoke({"email": email, "context": context, "funcs": funcs})
+def generate_actions(email: str, context: dict, funcs: list) -> dict:
+    assert isinstance(context, dict) or isinstance(context, str), f"Context is a {type(context)}."
+    """
+    Given an email, a set of options of what our backend can do with JIRA,
+    some context related to the user's current JIRA setup (projects, current issues, tasks, etc),
+    and a list of functions we have access to in order to interact with JIRA,
+    we need to make a decision about what to do with the JIRA API, if anything.
+
+    The context can also be passed already rendered (see dict_to_str).
+    """
+
+    if isinstance(context, dict):
+        context = dict_to_str(context)
+
+    output = _actions_chain().invoke({"email": email, "context": context, "funcs": funcs})
 
     output = re.sub("(```python|```py|```)", "", output)
 
@@ -208,18 +232,9 @@ def generate_actions(email: str, context: dict, funcs: list) -> dict:
         return output
 
 # Unified Database Features
-def extract_features(email: str, schema: str) -> dict:
-    """
-    Given an email, and what our current database looks like, we need to decide what information to extract
-    and remember from the email for later analysis or use as far as recommendations or insights in the app go.
-
-    Assume context has the keys:
-    - "projects": List of JIRA project names
-    - "issues": List of JIRA issue keys
-    - "tasks": List of JIRA task keys
-    - "users": List of JIRA user keys
-    """
-
+@lru_cache(maxsize=None)
+def _features_chain():
+    """Prompt and model behind extract_features, built once per process."""
     prefix = _SYS_PROMPT + """
     You are an assistant working on the data aggregation and analysis module of the Nirvana app. 
     Your task is to extract relevant information from the incoming email and store it in the database for future analysis and insights. 
@@ -323,26 +338,41 @@ def extract_features(email: str, schema: str) -> dict:
         prefix=prefix
     )
 
-    chain = (
+    return (
         prompt
-        | Arctic()
+        | _arctic()
         | StrOutputParser()
     )
 
+def extract_features(email: str, schema: str) -> dict:
+    """
+    Given an email, and what our current database looks like, we need to decide what information to extract
+    and remember from the email for later analysis or use as far as recommendations or insights in the app go.
+
+    Assume context has the keys:
+    - "projects": List of JIRA project names
+    - "issues": List of JIRA issue keys
+    - "tasks": List of JIRA task keys
+    - "users": List of JIRA user keys
+    """
+
     # print("Given email:", email)
     # print("Schema:", schema)
 
     try:
-        output = chain.invoke({"email": email, "schema": schema})
+        output = _features_chain().invoke({"email": email, "schema": schema})
     except Exception as e:
+        # Re-raised as is, so callers can tell a network hiccup (worth retrying) from bad output
         print("Error with feature extraction chain invocation:", e)
-        output = []
+        raise
     # print("Output:", output)
 
     return {"extracted_information": literal_eval(output)}
 
 # Misc
-def generate_sql(request: str, schema: str) -> dict:
+@lru_cache(maxsize=None)
+def _sql_chain():
+    """Prompt and model behind generate_sql, built once per process."""
     prompt = PromptTemplate.from_template(
         """
         You are a professional data engineer working on the data analysis module of the Nirvana app.
@@ -362,33 +392,22 @@ def generate_sql(request: str, schema: str) -> dict:
         """
     )
 
-    chain = (
+    return (
         prompt
-        | Arctic()
+        | _arctic()
         | StrOutputParser()
     )
 
-    output = chain.invoke({"request": request, "schema": schema})
+def generate_sql(request: str, schema: str) -> dict:
+    output = _sql_chain().invoke({"request": request, "schema": schema})
 
     return {"sql_query": output}
 
-def generate_visualization(args: list) -> dict:
-    """
-    Given a single request and data, generate a base64 encoded image of a visualization for the data.
-    """
+@lru_cache(maxsize=None)
+def _visualization_chain():
+    """Prompt and model behind generate_visualization, built once per process."""
     libs = ["matplotlib", "seaborn", "pandas", "numpy"]
 
-    print(f"generate_visualization({args})")
-
-    try:
-        args = json.loads(args)
-        request = args[0]
-        data = dict_to_str(args[1])
-    except Exception as e:
-        print("Error parsing args:", e)
-        print("Args:", args)
-        return {"result": """Error parsing args. Ensure the data is in the correct format, e.g., ["{natural language request here}", {data JSON here}]"""}
-
     prefix = _SYS_PROMPT + f"""
     You are a data visualization expert working on the data analysis module of the Nirvana app.
 
@@ -408,19 +427,34 @@ def generate_visualization(args: list) -> dict:
         """
     )
 
-    chain = (
+    return (
         prompt
-        | Arctic()
+        | _arctic()
         | StrOutputParser()
     )
 
+def generate_visualization(args: list) -> dict:
+    """
+    Given a single request and data, generate a base64 encoded image of a visualization for the data.
+    """
+    print(f"generate_visualization({args})")
+
+    try:
+        args = json.loads(args)
+        request = args[0]
+        data = dict_to_str(args[1])
+    except Exception as e:
+        print("Error parsing args:", e)
+        print("Args:", args)
+        return {"result": """Error parsing args. Ensure the data is in the correct format, e.g., ["{natural language request here}", {data JSON here}]"""}
+
     print("Request:", request)
 
     # print("Data Type:", type(data))
     print("Data:", data)
 
     try:
-        code = chain.invoke({"request": request, "data": data})
+        code = _visualization_chain().invoke({"request": request, "data": data})
     except Exception as e:
         raise e
 
@@ -456,6 +490,53 @@ class Function(BaseModel):
     def __str__(self):
         return self.string, self.description
 
+class AgentEventHandler(BaseCallbackHandler):
+    """
+    Forwards what the chat agent is doing to emit(event, data) as it happens:
+    - "tool_call": the agent picked a tool ({"tool", "input"})
+    - "tool_result": the tool returned ({"output"})
+    - "token": a piece of the final answer ({"text"})
+    """
+    _FINAL_ANSWER = "Final Answer:"
+
+    def __init__(self, emit, max_output_chars: int = 2000):
+        self.emit = emit
+        self.max_output_chars = max_output_chars
+        self._text = {}
+        self._answering = set()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._text[run_id] = ""
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id in self._answering:
+            self.emit("token", {"text": token})
+            return
+
+        # Until the model writes "Final Answer:" it is still reasoning about which tool to use
+        text = self._text.get(run_id, "") + token
+        self._text[run_id] = text
+        index = text.find(self._FINAL_ANSWER)
+        if index != -1:
+            self._answering.add(run_id)
+            answer = text[index + len(self._FINAL_ANSWER):].lstrip()
+            if answer:
+                self.emit("token", {"text": answer})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._text.pop(run_id, None)
+        self._answering.discard(run_id)
+
+    def on_agent_action(self, action, **kwargs):
+        self.emit("tool_call", {"tool": action.tool, "input": str(action.tool_input)})
+
+    def on_tool_end(self, output, **kwargs):
+        self.emit("tool_result", {"output": str(output)[:self.max_output_chars]})
+
+# Database of the chat request being served. The agent's tools read it from here,
+# so a single agent can serve concurrent requests for different users.
+_current_rds = ContextVar("current_rds", default=None)
+
 class ChatArctic:
     """
     Wrapper for Arctic Model that handles the /chat endpoint.
@@ -465,11 +546,14 @@ class ChatArctic:
     The model should be able to:
     - Visualize data
     - Answer specific questions about the data
+
+    The agent and its tools are built once (see get_chat_agent); the request's RdsManager
+    is passed to invoke.
     """
-    def __init__(self, rds: RdsManager):
+    def __init__(self, rds: RdsManager = None):
         self.rds = rds
 
-        llm_math = LLMMathChain(llm=Arctic(), verbose=True)
+        llm_math = LLMMathChain(llm=_arctic(), verbose=True)
         math_tool = Tool(
             name='Fancy Calculator',
             func=llm_math.run,
@@ -478,7 +562,7 @@ class ChatArctic:
 
         sql_executor = Tool(
             name='SQL Executor',
-            func=lambda x: self.rds.execute_core_sql(re.sub("(```sql|```)", "", x)),
+            func=lambda x: self._db().execute_core_sql(re.sub("(```sql|```)", "", x)),
             description="Executes SQL queries on the database. Ensure that the queries are safe, are valid, and do not contain invalid characters. You should pass only a SQL query string to this tool."
         )
 
@@ -492,19 +576,52 @@ class ChatArctic:
             """
         )
 
-        tools = [math_tool, sql_executor, visualizer]
+        issue_search = Tool(
+            name='Issue Search',
+            func=lambda x: self._search_issues(x),
+            description="Finds the Jira issues (in the issue tables, e.g. Tasks) whose summary and description are closest in meaning to the given text. Returns their table, IssueID and summary, most relevant first. Useful to find which issues a vague request refers to before querying them with SQL."
+        )
+
+        tools = [math_tool, sql_executor, visualizer, issue_search]
 
         self.agent = initialize_agent(
             agent="zero-shot-react-description",
             tools=tools,
-            llm=GPT(model="gpt-4o", temperature=0.4, api_key=os.getenv("OPENAI_API_KEY")),
+            # Streaming lets AgentEventHandler see tokens as they are generated
+            llm=with_cache(GPT(model="gpt-4o", temperature=0.4, streaming=True, api_key=os.getenv("OPENAI_API_KEY"))),
             max_iterations=7,
             handle_parsing_errors=True,
             verbose=True # Set to False for production
         )
 
-    def invoke(self, message: str) -> str:
-        metadata = self.rds.get_metadata()
+    def _db(self) -> RdsManager:
+        rds = _current_rds.get() or self.rds
+        if rds is None:
+            raise RuntimeError("No database bound to this chat request.")
+        return rds
+
+    def _search_issues(self, text: str, k: int = 5) -> str:
+        results = search_issues(self._db().schema_name, text, k=k)
+        if not results:
+            return "No matching issues found."
+        return "\n".join(
+            f"{result['table']} IssueID={result['id']}: {result['summary']} (similarity {result['score']:.2f})"
+            for result in results
+        )
+
+    def invoke(self, message: str, rds: RdsManager = None, callbacks: list = None) -> str:
+        """
+        Answer a message against the given database.
+        Pass an AgentEventHandler in callbacks to follow the run as it happens.
+        """
+        token = _current_rds.set(rds or self.rds)
+        try:
+            return self._run(message, callbacks)
+        finally:
+            _current_rds.reset(token)
+
+    def _run(self, message: str, callbacks: list = None) -> str:
+        metadata = self._db().get_metadata()
         print("-llm.py Metadata:", metadata)
         output = self.agent.run(_SYS_PROMPT 
                             + f"""
@@ -532,6 +649,12 @@ class ChatArctic:
 
                             User's Message:
                             """
-                            + message)
+                            + message,
+                            callbacks=callbacks)
         print("Model response:", output)
         return output
+
+@lru_cache(maxsize=None)
+def get_chat_agent() -> ChatArctic:
+    """The process-wide ChatArctic agent."""
+    return ChatArctic()
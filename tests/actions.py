@@ -0,0 +1,120 @@
+"""Tests for parsing, validating and merging the Jira actions suggested by the LLM (no Jira or LLM needed)"""
+
+from backend.v1.actions.service import Action, parse_action, parse_actions, merge_actions, execute_actions
+
+class FakeClient:
+    """Records the calls the dispatcher makes instead of talking to Jira."""
+    cloud_id = "test-cloud"
+    max_concurrency = 4
+    bulk_size = 50
+
+    def __init__(self):
+        self.calls = []
+
+    def update_issue(self, issue, due_date=None, assignee=None, status=None, priority=None):
+        self.calls.append(("update_issue", issue, {"due_date": due_date, "assignee": assignee, "status": status, "priority": priority}))
+        return issue
+
+    def transfer_issue(self, issue, status):
+        self.calls.append(("transfer_issue", issue, {"status": status}))
+        return issue
+
+    def create_issues(self, issues):
+        self.calls.append(("create_issues", None, issues))
+        return [{"ok": True, "issue": {"key": f"NEW-{i}"}, "error": None} for i, _ in enumerate(issues)]
+
+def expect_rejected(action):
+    try:
+        Action.parse(action)
+    except ValueError as e:
+        print(f"Rejected as expected: {e}")
+        return
+    raise Exception(f"Action should have been rejected: {action}")
+
+def test_rejects_unsafe_actions():
+    # Not whitelisted, or not a plain call of a whitelisted method
+    expect_rejected('__import__("os").system("rm -rf /")')
+    expect_rejected('delete_issue(issue="KAN-1")')
+    expect_rejected('client.update_issue(issue="KAN-1")')
+    expect_rejected('update_issue(issue="KAN-1").__class__')
+    # Only literal arguments, matching the method's signature
+    expect_rejected('update_issue(issue=open("/etc/passwd").read())')
+    expect_rejected('update_issue(issue="KAN-1", reporter="me")')
+    expect_rejected('update_issue(due_date="2024-06-30")')
+    expect_rejected('update_issue(**{"issue": "KAN-1"})')
+    expect_rejected('create_issue(project="P")')
+    expect_rejected('update_issue(issue={[1]: 2})')
+    # The dict form comes from the client
+    expect_rejected({"operation": "update_issue", "issue": "KAN-1", "fields": [1]})
+    expect_rejected({"operation": "update_issue", "issue": "KAN-1", "fields": ["ab"]})
+
+def test_parses_actions():
+    assert parse_action('update_issue(issue="KAN-1", status="Done")') == ("update_issue", {"issue": "KAN-1", "status": "Done"})
+    # Positional arguments are named after the method's parameters
+    assert parse_action('transfer_issue("KAN-1", "Done")') == ("transfer_issue", {"issue": "KAN-1", "status": "Done"})
+
+    action = Action.parse({"operation": "update_issue", "issue": "KAN-1", "fields": {"priority": "High"}})
+    assert action.to_dict() == {"operation": "update_issue", "issue": "KAN-1", "fields": {"priority": "High"}}
+    assert Action.parse(repr(action)) == action
+
+def test_invalid_quoting_fallback():
+    # Unescaped quotes inside the list: not a Python literal, so the calls are pulled out one by one
+    output = '''
+        ["update_issue(issue="Falcon-103", due_date="2024-06-30")",
+        "create_issue(project="Project Falcon", summary="Fix (integration) discrepancies",
+        priority="High")", "delete_issue(issue="Falcon-1")"]
+        '''
+    actions = parse_actions(output)
+    assert [action.operation for action in actions] == ["update_issue", "create_issue"], actions
+    assert actions[0].issue == "Falcon-103" and actions[0].fields == {"due_date": "2024-06-30"}
+    assert actions[1].fields["summary"] == "Fix (integration) discrepancies"
+
+    # A valid literal list, with a bad entry that is skipped
+    actions = parse_actions("['update_issue(issue=\"A-1\", status=\"Done\")', 'eval(\"1\")']")
+    assert actions == [Action("update_issue", "A-1", {"status": "Done"})], actions
+    assert parse_actions("") == []
+    assert parse_actions("[update_issue(issue={[1]: 2})]") == []
+
+def test_merges_updates_of_the_same_issue():
+    merged = merge_actions([
+        (0, Action("update_issue", "KAN-1", {"due_date": "2024-06-30"})),
+        (1, Action("transfer_issue", "KAN-1", {"status": "Done"})),
+        (2, Action("update_issue", "KAN-1", {"due_date": "2024-07-01"})),
+    ])
+    assert merged == [([0, 1, 2], Action("update_issue", "KAN-1", {"due_date": "2024-07-01", "status": "Done"}))], merged
+
+    # Identical actions run once; different issues are never merged
+    merged = merge_actions([
+        (0, Action("update_issue", "KAN-1", {"status": "Done"})),
+        (1, Action("update_issue", "KAN-1", {"status": "Done"})),
+        (2, Action("update_issue", "KAN-2", {"status": "Done"})),
+    ])
+    assert [indices for indices, _ in merged] == [[0, 1], [2]], merged
+
+def test_execute_actions():
+    client = FakeClient()
+    outcome = execute_actions([
+        'update_issue(issue="KAN-1", due_date="2024-06-30")',
+        'transfer_issue(issue="KAN-1", status="Done")',
+        'create_issue(project="P", summary="New task")',
+        'create_issue(project="P", summary="New task")',
+        'delete_issue(issue="KAN-2")',
+    ], client)
+
+    # One update for KAN-1 and one bulk create, the duplicate creation sent once
+    assert sorted(call[0] for call in client.calls) == ["create_issues", "update_issue"], client.calls
+    update = next(call for call in client.calls if call[0] == "update_issue")
+    assert update[2]["due_date"] == "2024-06-30" and update[2]["status"] == "Done"
+    create = next(call for call in client.calls if call[0] == "create_issues")
+    assert len(create[2]) == 1
+
+    assert outcome["succeeded"] == 4 and outcome["failed"] == 1, outcome
+    assert outcome["results"][4]["error"] == "Unsupported operation 'delete_issue'"
+
+if __name__ == '__main__':
+    test_rejects_unsafe_actions()
+    test_parses_actions()
+    test_invalid_quoting_fallback()
+    test_merges_updates_of_the_same_issue()
+    test_execute_actions()
+    print("All action tests passed")
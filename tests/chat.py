@@ -15,6 +15,16 @@ def test_message(prompt: str):
     else:
         raise Exception(response['response'])
 
+def test_stream(prompt: str):
+    response = requests.post('http://localhost:5000/v1/chat/stream', json={
+        'message': prompt,
+        'google-auth-token': "yes"
+    }, stream=True)
+
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            print(line)
+
 if __name__ == '__main__':
     prompts = [
         "Hey, what's your name?",
@@ -23,6 +33,7 @@ if __name__ == '__main__':
     for prompt in prompts:
         try:
             test_message(prompt)
+            test_stream(prompt)
         except Exception as e:
             print(e)
         print()
\ No newline at end of file
@@ -1,14 +1,36 @@
 """Tests for the v1/data endpoint"""
 
 import requests
+import time
 
 def test_email(email: str):
-    response = requests.post('http://localhost:5000/v1/data', json={'email': email}).json()
+    response = requests.post('http://localhost:5000/v1/data', json={'email': email})
 
-    if response['status'] == 200:
-        print(response['response'])
+    if response.status_code == 202:
+        print(response.json()['response'])
+        wait_for_job(response.json()['job_id'])
     else:
-        raise Exception(response['response'])
+        raise Exception(response.json()['response'])
+
+def wait_for_job(job_id: str, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f'http://localhost:5000/v1/data/jobs/{job_id}', json={}).json()
+        if job.get('status') in ('succeeded', 'failed'):
+            print(job)
+            return job
+        time.sleep(2)
+
+    raise Exception(f'Job {job_id} did not finish within {timeout}s')
+
+def test_batch(emails: list):
+    response = requests.post('http://localhost:5000/v1/data/batch', json={'emails': emails})
+
+    if response.status_code == 200:
+        for result in response.json()['results']:
+            print(result)
+    else:
+        raise Exception(response.json()['response'])
 
 if __name__ == '__main__':
     emails = [
@@ -96,4 +118,6 @@ if __name__ == '__main__':
 
     for email in emails:
         test_email(email)
-        print()
\ No newline at end of file
+        print()
+
+    test_batch(emails)
\ No newline at end of file
@@ -0,0 +1,99 @@
+import hashlib
+import threading
+import time
+import re
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Example:
+
+        .. code-block:: python
+
+            cache = TTLCache(maxsize=128, ttl=60)
+            cache.set("key", "value")
+            cache.get("key")  # -> "value" (or None once expired / evicted)
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_QUOTE_MARKERS = re.compile(r"^[ \t]*>+[ \t]?", re.MULTILINE)
+_SUBJECT_PREFIXES = re.compile(r"\b(re|fw|fwd)\s*:", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of an email's normalised content, so forwards, replies and retries of the same email collide.
+
+    Normalisation strips quote markers ("> ") and Re:/Fwd: prefixes, collapses whitespace and ignores case.
+    """
+    text = _QUOTE_MARKERS.sub("", text or "")
+    text = _SUBJECT_PREFIXES.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip().lower()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,357 @@
+import hashlib
+import threading
+import shutil
+import json
+import time
+import os
+import re
+
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+# Define EMBEDDING_* settings in .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Embeds text by hashing its words and word pairs into a fixed number of buckets.
+    No model to download and a few microseconds per text, but purely lexical: texts only score
+    above 0 when they share words. Used when EMBEDDING_MODEL is "hashing".
+
+    Example:
+
+        .. code-block:: python
+
+            embedder = HashingEmbedder(dim=512)
+            vectors = embedder.embed(["Review integration specifications", "Finalize deliverables"])
+            vectors.shape  # -> (2, 512), rows L2-normalised
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _bucket(self, feature: str):
+        # hashlib rather than hash(), which is salted per process
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORDS.findall((text or "").lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign
+
+        # Dampen repeated words, then normalise so a dot product is a cosine similarity
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceEmbedder:
+    """
+    Sentence embeddings from a sentence-transformers model, always run on CPU.
+    The default, all-MiniLM-L6-v2, is small (~90MB, 384 dimensions) and embeds an issue in a few
+    milliseconds, so that issues are matched by meaning rather than by shared words.
+
+    Example:
+
+        .. code-block:: python
+
+            embedder = SentenceEmbedder("sentence-transformers/all-MiniLM-L6-v2")
+            vectors = embedder.embed(["cannot sign in to the website", "Fix login page bug"])
+            float(vectors[0] @ vectors[1])  # -> well above 0, although they share no word
+    """
+
+    def __init__(self, model_name: str, revision: str = None, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name if revision is None else f"{model_name}@{revision}"
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, revision=revision, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.model.encode(
+            [text or "" for text in texts], batch_size=self.batch_size,
+            convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+        ).astype(np.float32)
+
+
+"""
+Issue embeddings.
+
+Settings:
+- EMBEDDING_MODEL: a sentence-transformers model (default sentence-transformers/all-MiniLM-L6-v2),
+  "hashing" for the lexical HashingEmbedder (no model to download) or "off"
+- EMBEDDING_MODEL_REVISION: the model revision (commit hash or tag) to load, to pin the model itself
+- EMBEDDING_DIM: dimensions of the hashing embedder (default 512)
+- EMBEDDINGS_DIR: where indexes are stored, one directory per schema and table (default embeddings)
+
+Changing the model makes existing indexes unusable until the next full sync rebuilds them.
+"""
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    """
+    Return the configured embedder, built once per process, or None if embeddings are off.
+    A model that can't be loaded (not installed, not downloadable) also turns them off for the life
+    of the process, rather than being retried on every search.
+    """
+    model = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+    if model == "off":
+        return None
+    if model == "hashing":
+        return HashingEmbedder(int(os.getenv("EMBEDDING_DIM", 512)))
+    try:
+        return SentenceEmbedder(model, revision=os.getenv("EMBEDDING_MODEL_REVISION") or None)
+    except Exception as e:
+        print(f"Error loading the embedding model {model}, issue embeddings are off: {e}")
+        return None
+
+
+def _adf_text(node) -> str:
+    """Plain text of an Atlassian Document Format node."""
+    if isinstance(node, dict):
+        return node.get("text") or " ".join(_adf_text(child) for child in node.get("content", []))
+    if isinstance(node, list):
+        return " ".join(_adf_text(child) for child in node)
+    return ""
+
+
+def issue_text(summary: Optional[str], description=None) -> str:
+    """The text embedded for an issue: its summary and description (plain or ADF, as dict or JSON)."""
+    if isinstance(description, str) and description.startswith("{"):
+        try:
+            description = json.loads(description)
+        except ValueError:
+            pass
+    if isinstance(description, (dict, list)):
+        description = _adf_text(description)
+    return f"{summary or ''}\n{description or ''}".strip()
+
+
+class EmbeddingIndex:
+    """
+    Embeddings of one table's issues, stored as a float32 matrix (vectors.npy) next to the
+    matching issue ids and summaries (ids.json). The matrix is memory-mapped when loaded.
+
+    Each write goes to a new version directory, and the CURRENT file is then swapped to point at it
+    with a single rename. Readers therefore always see the vectors and ids of the same version.
+
+    Example:
+
+        .. code-block:: python
+
+            index = EmbeddingIndex("embeddings/user_schema/Tasks", get_embedder())
+            index.upsert(["10001"], ["Review integration specifications"], ["Review integration specifications"])
+            index.search("integration specs", k=5)  # -> [{"id": "10001", "summary": ..., "score": 0.71}]
+    """
+
+    def __init__(self, path: str, embedder):
+        self.path = path
+        self.embedder = embedder
+        self._lock = threading.RLock()
+        self._version = None
+        self._load()
+
+    @property
+    def _current_path(self) -> str:
+        return os.path.join(self.path, "CURRENT")
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(self._current_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _empty(self):
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.ids = []
+        self.summaries = []
+
+    def _load(self, attempts: int = 3):
+        with self._lock:
+            self._empty()
+            version = self._current_version()
+            self._version = version
+            if version is None:
+                return
+
+            directory = os.path.join(self.path, version)
+            try:
+                with open(os.path.join(directory, "ids.json")) as f:
+                    stored = json.load(f)
+                vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                # A writer replaced (and cleaned up) this version after we read CURRENT
+                if attempts > 1:
+                    return self._load(attempts - 1)
+                raise
+
+            if stored.get("model") != self.embedder.name:
+                # Vectors of another model are not comparable; they are rebuilt on the next full sync
+                print(f"Ignoring embeddings in {self.path}: built with {stored.get('model')}, not {self.embedder.name}")
+                return
+            if vectors.shape[0] != len(stored["ids"]) or vectors.shape[1] != self.embedder.dim:
+                print(f"Ignoring embeddings in {directory}: {vectors.shape} vectors for {len(stored['ids'])} ids")
+                return
+
+            self.vectors = vectors
+            self.ids = stored["ids"]
+            self.summaries = stored["summaries"]
+
+    def refresh(self):
+        """Reload if another process has written the index since we loaded it."""
+        if self._current_version() != self._version:
+            self._load()
+
+    def _save(self, vectors: np.ndarray, ids: list, summaries: list):
+        version = f"v{time.time_ns()}-{os.getpid()}"
+        directory = os.path.join(self.path, version)
+        os.makedirs(directory)
+        with open(os.path.join(directory, "vectors.npy"), "wb") as f:
+            np.save(f, vectors)
+        with open(os.path.join(directory, "ids.json"), "w") as f:
+            json.dump({"model": self.embedder.name, "ids": ids, "summaries": summaries}, f)
+
+        # The only step readers can observe: CURRENT moves from one complete version to the next
+        with open(self._current_path + f".{version}.tmp", "w") as f:
+            f.write(version)
+        os.replace(self._current_path + f".{version}.tmp", self._current_path)
+        self._load()
+
+        # Older versions are no longer reachable (open memory maps keep their data alive)
+        for entry in os.listdir(self.path):
+            if entry.startswith("v") and entry != version:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def upsert(self, ids: List[str], texts: List[str], summaries: List[str] = None, replace: bool = False):
+        """Embed and store the given issues, overwriting ones already indexed. replace=True drops every other issue."""
+        summaries = summaries or [text.split("\n", 1)[0] for text in texts]
+        self.upsert_vectors(ids, self.embedder.embed(texts), summaries, replace=replace)
+
+    def upsert_vectors(self, ids: List[str], new_vectors: np.ndarray, summaries: List[str], replace: bool = False):
+        """Same as upsert, for issues already embedded (see IndexWriter)."""
+        if not ids and not replace:
+            return
+        ids = [str(issue_id) for issue_id in ids]
+
+        with self._lock:
+            self.refresh()
+            if replace:
+                vectors, all_ids, all_summaries = np.zeros((0, self.embedder.dim), dtype=np.float32), [], []
+            else:
+                vectors, all_ids, all_summaries = np.array(self.vectors), list(self.ids), list(self.summaries)
+            positions = {issue_id: position for position, issue_id in enumerate(all_ids)}
+
+            appended = []
+            for row, issue_id in enumerate(ids):
+                if issue_id in positions:
+                    vectors[positions[issue_id]] = new_vectors[row]
+                    all_summaries[positions[issue_id]] = summaries[row]
+                else:
+                    positions[issue_id] = len(all_ids)
+                    all_ids.append(issue_id)
+                    all_summaries.append(summaries[row])
+                    appended.append(row)
+
+            if appended:
+                vectors = np.concatenate([vectors, new_vectors[appended]])
+            self._save(vectors, all_ids, all_summaries)
+
+    def search(self, text: str, k: int = 5) -> list:
+        """The (up to) k issues closest to the text, most similar first. Unrelated issues (score <= 0) are left out."""
+        with self._lock:
+            vectors, ids, summaries = self.vectors, self.ids, self.summaries
+        if not ids or k <= 0:
+            return []
+
+        scores = vectors @ self.embedder.embed([text])[0]
+        k = min(k, len(ids))
+        # argpartition finds the top k in linear time; only those are sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": ids[i], "summary": summaries[i], "score": float(scores[i])} for i in top if scores[i] > 0]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class IndexWriter:
+    """
+    Embeds issues batch by batch (e.g. as a sync flushes them) and writes them to the index in one go
+    on commit. Only the ids, vectors and summaries are held in between, never the issues themselves.
+    """
+
+    # Summaries are only kept to label search results
+    max_summary_length = 200
+
+    def __init__(self, index: EmbeddingIndex, replace: bool = False):
+        self.index = index
+        self.replace = replace
+        self.ids = []
+        self.vectors = []
+        self.summaries = []
+
+    def add(self, ids: List[str], texts: List[str], summaries: List[str]):
+        self.vectors.append(self.index.embedder.embed(texts))
+        self.ids += [str(issue_id) for issue_id in ids]
+        self.summaries += [(summary or "")[:self.max_summary_length] for summary in summaries]
+
+    def commit(self):
+        vectors = np.concatenate(self.vectors) if self.vectors else np.zeros((0, self.index.embedder.dim), dtype=np.float32)
+        self.index.upsert_vectors(self.ids, vectors, self.summaries, replace=self.replace)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(schema: str, table: str) -> Optional[EmbeddingIndex]:
+    """Return the (process-wide) index of a schema's table, or None if embeddings are off."""
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+
+    path = os.path.join(os.getenv("EMBEDDINGS_DIR", "embeddings"), schema or "public", table)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = EmbeddingIndex(path, embedder)
+    index.refresh()
+    return index
+
+
+def search_issues(schema: str, text: str, k: int = 5, tables: List[str] = None) -> list:
+    """
+    The k issues of a schema most similar to the text, across its issue tables (or the given ones).
+    Each result carries its table, issue id, summary and cosine similarity.
+    """
+    if get_embedder() is None:
+        return []
+
+    if tables is None:
+        directory = os.path.join(os.getenv("EMBEDDINGS_DIR", "embeddings"), schema or "public")
+        tables = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    results = []
+    for table in tables:
+        results += [dict(result, table=table) for result in get_index(schema, table).search(text, k)]
+    return sorted(results, key=lambda result: -result["score"])[:k]
@@ -0,0 +1,176 @@
+import hashlib
+import sqlite3
+import threading
+import warnings
+import json
+import time
+import os
+
+from typing import Any, Optional, Sequence
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation, GenerationChunk
+
+from utils.cache import TTLCache
+
+# Define LLM_CACHE* settings in .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+# Only what LLM calls return is ever read back from disk
+_CACHED_OBJECTS = [Generation, GenerationChunk, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+# dumps/loads are stable enough for a cache whose entries can simply be dropped
+warnings.filterwarnings("ignore", message=r"The function `(dumps|loads)` is in beta", category=LangChainBetaWarning)
+
+
+def _cache_key(prompt: str, llm_string: str) -> str:
+    """
+    LangChain's llm_string already encodes the model id and its sampling parameters
+    (see Arctic._identifying_params), so together with the rendered prompt it identifies a response.
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class LRULLMCache(BaseCache):
+    """In-memory LRU cache of LLM responses, shared by every model in the process."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        return self._cache.get(_cache_key(prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self._cache.set(_cache_key(prompt, llm_string), list(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return dict(self._cache.stats(), backend="memory")
+
+
+class SQLiteLLMCache(BaseCache):
+    """On-disk cache of LLM responses, surviving restarts and shared by processes on the same host."""
+
+    def __init__(self, path: str = "llm_cache.sqlite", ttl: float = 0):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                generations TEXT NOT NULL,
+                created_at REAL NOT NULL
+                )
+            """)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created_at FROM llm_cache WHERE key = ?",
+                (_cache_key(prompt, llm_string),)
+            ).fetchone()
+
+            if row is None or (self.ttl and row[1] + self.ttl <= time.time()):
+                self.misses += 1
+                return None
+
+        try:
+            generations = [loads(generation, allowed_objects=_CACHED_OBJECTS) for generation in json.loads(row[0])]
+        except ValueError as e:
+            # Unreadable, or holding objects we don't deserialize: answered by the model instead
+            print(f"Ignoring cached LLM response: {e}")
+            generations = None
+        with self._lock:
+            if generations is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        generations = json.dumps([dumps(generation) for generation in return_val])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, generations, created_at) VALUES (?, ?, ?)",
+                (_cache_key(prompt, llm_string), generations, time.time())
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "backend": "sqlite",
+                "size": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+"""
+Process-wide response cache.
+
+Settings:
+- LLM_CACHE: "memory" (default), "sqlite" or "off"
+- LLM_CACHE_SIZE: entries kept by the memory backend (default 1024)
+- LLM_CACHE_PATH: database file of the sqlite backend (default llm_cache.sqlite)
+- LLM_CACHE_TTL: seconds before a response expires (default 0, never)
+- LLM_CACHE_MAX_TEMPERATURE: models sampling above this temperature are never cached (default 0.2)
+"""
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[BaseCache]:
+    """Return the configured response cache, or None if caching is off."""
+    global _llm_cache
+    backend = os.getenv("LLM_CACHE", "memory")
+    if backend == "off":
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            ttl = float(os.getenv("LLM_CACHE_TTL", 0))
+            if backend == "sqlite":
+                _llm_cache = SQLiteLLMCache(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"), ttl=ttl)
+            else:
+                _llm_cache = LRULLMCache(int(os.getenv("LLM_CACHE_SIZE", 1024)), ttl=ttl)
+        return _llm_cache
+
+
+def with_cache(model):
+    """
+    Attach the response cache to a LangChain model, unless it samples at a temperature
+    where identical prompts are expected to produce different answers.
+    """
+    temperature = getattr(model, "temperature", None)
+    max_temperature = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", 0.2))
+    cache = get_llm_cache()
+
+    if cache is None or temperature is None or temperature > max_temperature:
+        # False (rather than None) also opts out of any global LangChain cache
+        model.cache = False
+    else:
+        model.cache = cache
+    return model
+
+
+def llm_cache_stats() -> dict:
+    """Hit/miss metrics of the response cache."""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {"backend": "off"}
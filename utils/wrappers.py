@@ -1,17 +1,68 @@
 import replicate
+import threading
+import asyncio
+import queue
+import time
+import os
 
-from typing import Any, Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
 from langchain_openai.chat_models import ChatOpenAI
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.llms import LLM
-from langchain_core.outputs import GenerationChunk
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
 
-# Define REPLICATE_API_TOKEN in .env file
+# Define REPLICATE_API_TOKEN (and optionally ARCTIC_MAX_CONCURRENCY, ARCTIC_REQUEST_TIMEOUT) in .env file
 from dotenv import load_dotenv
 load_dotenv()
 
 
+class StopScanner:
+    """Finds stop sequences in a token stream, including ones split across tokens.
+
+    Only the last (longest stop - 1) characters are held back, since they could still
+    be the start of a stop sequence; everything before them is released right away.
+
+    Example:
+
+        .. code-block:: python
+
+            scanner = StopScanner(["Observation:"])
+            "".join(scanner.feed(token) for token in ["Answer", "\nObser", "vation: 42"])  # -> "Answer\n"
+            scanner.stopped  # -> True
+    """
+
+    def __init__(self, stop: Optional[List[str]] = None):
+        self.stop = [s for s in stop or [] if s]
+        self.keep = max((len(s) for s in self.stop), default=1) - 1
+        self.buffer = ""
+        self.stopped = False
+
+    def feed(self, token: str) -> str:
+        """Add a token and return the text that is now safe to emit."""
+        if self.stopped:
+            return ""
+
+        self.buffer += token
+        hits = [index for index in (self.buffer.find(s) for s in self.stop) if index != -1]
+        if hits:
+            self.stopped = True
+            text, self.buffer = self.buffer[:min(hits)], ""
+            return text
+
+        if len(self.buffer) > self.keep:
+            cut = len(self.buffer) - self.keep
+            text, self.buffer = self.buffer[:cut], self.buffer[cut:]
+            return text
+        return ""
+
+    def flush(self) -> str:
+        """Release whatever is still held back once the stream has ended."""
+        text, self.buffer = self.buffer, ""
+        return "" if self.stopped else text
+
+
 class Arctic(LLM):
     """A custom LangChain wrapper for Snowflake Arctic.
 
@@ -23,14 +74,175 @@ class Arctic(LLM):
             result = model.invoke([HumanMessage(content="hello")])
             result = model.batch([[HumanMessage(content="hello")],
                                  [HumanMessage(content="world")]])
+            result = await model.ainvoke([HumanMessage(content="hello")])
+
+    Batches run up to `max_concurrency` generations at a time (threads for batch,
+    the async Replicate client for abatch), each cut off after `request_timeout` seconds.
     """
 
+    model: str = "snowflake/snowflake-arctic-instruct"
+    temperature: float = 0.2
+    token_limit: int = 512
+    system_message: str = "You're a helpful assistant"
+    max_concurrency: int = int(os.getenv("ARCTIC_MAX_CONCURRENCY", 8))
+    request_timeout: Optional[float] = float(os.getenv("ARCTIC_REQUEST_TIMEOUT", 120)) or None
+
+    def _input(
+        self,
+        prompt: str,
+        temperature: Optional[float],
+        token_limit: Optional[int],
+        system_message: Optional[str],
+        stop: Optional[List[str]],
+    ) -> Dict[str, Any]:
+        """Build the Replicate input, falling back to the model's defaults."""
+        temperature = self.temperature if temperature is None else temperature
+        token_limit = token_limit or self.token_limit
+        system_message = system_message or self.system_message
+
+        # Let Replicate stop server-side too (saving tokens); the list is comma-separated,
+        # so stops containing a comma are only enforced client-side
+        stop_sequences = ["<|im_end|>"] + [s for s in stop or [] if s and "," not in s]
+
+        return {
+            "top_k": 50,
+            "top_p": 0.9,
+            "temperature": temperature,
+            "max_new_tokens": token_limit,
+            "min_new_tokens": 0,
+            "stop_sequences": ",".join(stop_sequences),
+            "prompt_template": f"<|im_start|>system\n{system_message}<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n\n<|im_start|>assistant\n",
+            "presence_penalty": 1.15,
+            "frequency_penalty": 0.2
+        }
+
+    def _generate_text(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
+        stop: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """Stream the completion from Replicate, cut off before the first stop sequence.
+
+        Shared by _call and _stream. If we stop early (a stop sequence, a timeout, or the caller
+        stops iterating), the prediction is cancelled so it stops generating tokens.
+        """
+        deadline = self._deadline()
+        prediction = replicate.models.predictions.create(
+            model=self.model,
+            input=self._input(prompt, temperature, token_limit, system_message, stop),
+            stream=True,
+        )
+        scanner = StopScanner(stop)
+        finished = False
+        try:
+            for event in self._events(prediction, deadline):
+                text = scanner.feed(str(event))
+                if text:
+                    yield text
+                if scanner.stopped:
+                    break
+            else:
+                finished = True
+                text = scanner.flush()
+                if text:
+                    yield text
+        finally:
+            if not finished:
+                try:
+                    prediction.cancel()
+                except Exception as e:
+                    print(f"Error cancelling Arctic prediction: {e}")
+
+    def _events(self, prediction, deadline: Optional[float]) -> Iterator[Any]:
+        """
+        The prediction's stream events, read by a helper thread so that request_timeout holds even
+        while no token arrives (queued or cold-booting model, stalled stream): TimeoutError is raised
+        once the deadline passes, and the caller's cleanup cancels the prediction.
+        """
+        events = queue.Queue()
+        done = object()
+
+        def pump():
+            try:
+                for event in prediction.stream():
+                    events.put((event, None))
+            except Exception as e:
+                events.put((done, e))
+            else:
+                events.put((done, None))
+
+        threading.Thread(target=pump, name="arctic-stream", daemon=True).start()
+        while True:
+            try:
+                event, error = events.get(timeout=self._remaining(deadline))
+            except queue.Empty:
+                raise TimeoutError(f"Arctic generation exceeded {self.request_timeout}s")
+            if error is not None:
+                raise error
+            if event is done:
+                return
+            yield event
+
+    async def _agenerate_text(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        """Async counterpart of _generate_text, on the async Replicate client."""
+        prediction = await replicate.models.predictions.async_create(
+            model=self.model,
+            input=self._input(prompt, temperature, token_limit, system_message, stop),
+            stream=True,
+        )
+        scanner = StopScanner(stop)
+        deadline = self._deadline()
+        finished = False
+        stream = prediction.async_stream().__aiter__()
+        try:
+            while True:
+                # Bounded by the deadline even while no token arrives
+                try:
+                    event = await asyncio.wait_for(stream.__anext__(), timeout=self._remaining(deadline))
+                except StopAsyncIteration:
+                    finished = True
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Arctic generation exceeded {self.request_timeout}s")
+                text = scanner.feed(str(event))
+                if text:
+                    yield text
+                if scanner.stopped:
+                    break
+
+            if finished:
+                text = scanner.flush()
+                if text:
+                    yield text
+        finally:
+            if not finished:
+                try:
+                    await prediction.async_cancel()
+                except Exception as e:
+                    print(f"Error cancelling Arctic prediction: {e}")
+
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.request_timeout if self.request_timeout else None
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
     def _call(
         self,
         prompt: str,
-        temperature: float = 0.2,
-        token_limit: int = 512,
-        system_message: str = "You're a helpful assistant",
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
@@ -48,34 +260,15 @@ class Arctic(LLM):
         Returns:
             The model output as a string. Actual completions SHOULD NOT include the prompt.
         """
-        output = ""
-        for event in replicate.stream(
-            "snowflake/snowflake-arctic-instruct",
-            input={
-                "top_k": 50,
-                "top_p": 0.9,
-                "temperature": temperature,
-                "max_new_tokens": token_limit,
-                "min_new_tokens": 0,
-                "stop_sequences": "<|im_end|>",
-                "prompt_template": f"<|im_start|>system\n{system_message}<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n\n<|im_start|>assistant\n",
-                "presence_penalty": 1.15,
-                "frequency_penalty": 0.2
-            },
-        ):
-            if stop and str(event) in stop:
-                break
-
-            output += str(event)
-
+        output = "".join(self._generate_text(prompt, temperature, token_limit, system_message, stop))
         return output.strip()
 
     def _stream(
         self,
         prompt: str,
-        temperature: float = 0.2,
-        token_limit: int = 512,
-        system_message: str = "You're a helpful assistant",
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
@@ -97,28 +290,87 @@ class Arctic(LLM):
         Returns:
             An iterator of GenerationChunks.
         """
-        for event in replicate.stream(
-            "snowflake/snowflake-arctic-instruct",
-            input={
-                "top_k": 50,
-                "top_p": 0.9,
-                "temperature": temperature,
-                "max_new_tokens": token_limit,
-                "min_new_tokens": 0,
-                "stop_sequences": "<|im_end|>",
-                "prompt_template": f"<|im_start|>system\n{system_message}<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n\n<|im_start|>assistant\n",
-                "presence_penalty": 1.15,
-                "frequency_penalty": 0.2
-            },
-        ):
-            if stop and str(event) in stop:
-                break
-            chunk = GenerationChunk(text=event)
+        for text in self._generate_text(prompt, temperature, token_limit, system_message, stop):
+            chunk = GenerationChunk(text=text)
             if run_manager:
                 run_manager.on_llm_new_token(chunk.text, chunk=chunk)
 
             yield chunk
 
+    async def _acall(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Async version of _call."""
+        async def collect() -> str:
+            return "".join([
+                text async for text in self._agenerate_text(prompt, temperature, token_limit, system_message, stop)
+            ])
+
+        # wait_for also covers a stream that stalls between tokens
+        output = await asyncio.wait_for(collect(), timeout=self.request_timeout)
+        return output.strip()
+
+    async def _astream(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        token_limit: Optional[int] = None,
+        system_message: Optional[str] = None,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Async version of _stream."""
+        async for text in self._agenerate_text(prompt, temperature, token_limit, system_message, stop):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+
+            yield chunk
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Run the prompts of a batch concurrently instead of one after the other (LLM's default)."""
+        def call(prompt: str) -> str:
+            return self._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+        if len(prompts) == 1:
+            texts = [call(prompts[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts))) as executor:
+                texts = list(executor.map(call, prompts))
+
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Async version of _generate, keeping at most max_concurrency predictions in flight."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def call(prompt: str) -> str:
+            async with semaphore:
+                return await self._acall(prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+        texts = await asyncio.gather(*(call(prompt) for prompt in prompts))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
     @property
     def _identifying_params(self) -> Dict[str, Any]:
         """Return a dictionary of identifying parameters."""
@@ -127,7 +379,11 @@ class Arctic(LLM):
             # rules in LLM monitoring applications (e.g., in LangSmith users
             # can provide per token pricing for their model and monitor
             # costs for the given LLM.)
-            "model_name": "CustomChatModel",
+            "model_name": self.model,
+            # Sampling parameters are part of the response cache key (see utils/llm_cache.py)
+            "temperature": self.temperature,
+            "token_limit": self.token_limit,
+            "system_message": self.system_message,
         }
 
     @property
@@ -146,4 +402,7 @@ if __name__ == "__main__":
     result = model.batch([[HumanMessage(content="what is your name?")],
                          [HumanMessage(content="hello my friend")]])
     print(result)
+    result = asyncio.run(model.abatch([[HumanMessage(content="what is your name?")],
+                                       [HumanMessage(content="hello my friend")]]))
+    print(result)
 